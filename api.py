@@ -1,23 +1,33 @@
 import csv
-import io
+import os
+import shutil
 import sqlite3
+import tempfile
 from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI, HTTPException, UploadFile, status
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 import state
 from auth import get_current_user
-from db import books_repo, users_repo
-from db.connection import init_db
+from config import WRITE_BEHIND
+from db import executor, users_repo, write_behind
+from db.connection import close_connections, init_db
 from models import Book
-from services import library_service
-from services.game_service import resolve_comparison, select_opponents
-from services.ranking_service import rank_books
-from services.scoring_service import (
-    calculate_progress,
-    confidence_score,
-)
+from services import library_actor, library_service
+from services.game_service import resolve_match
+from services.import_jobs import ImportJobs
+from services.library import Library, LibraryCache
 
 # ====== APP SETUP
 
@@ -25,12 +35,58 @@ from services.scoring_service import (
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     init_db(state.db_path)
-    state.books = books_repo.get_all()
+    write_behind.recover(state.db_path)
+    if WRITE_BEHIND:
+        write_behind.enable(state.db_path)
+
+    executor.start()
+    library_actor.start()
+    state.libraries = LibraryCache()
+    state.import_jobs = ImportJobs()
     yield
 
+    state.import_jobs.shutdown()
+    library_actor.stop()
+    executor.stop()
+    state.libraries.clear()
+    write_behind.disable()
+    close_connections()
+
 
+# Endpoints are async and never block the event loop. Changes to a library are awaited
+# on its actor, reads are served from its snapshots, and other database work is
+# awaited on db.executor's threads.
 app = FastAPI(lifespan=lifespan)
 
+_user_ids = {}  # {clerk_id: user id}, for users already synced
+
+
+async def get_user_id(clerk_id: str = Depends(get_current_user)):
+    """Return the authenticated user's ID."""
+    user_id = _user_ids.get(clerk_id)
+    if user_id is None:
+        user = await executor.read(users_repo.get_by_clerk_id, clerk_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
+        user_id = _user_ids[clerk_id] = user["id"]
+
+    return user_id
+
+
+async def get_library(user_id: int = Depends(get_user_id)):
+    """Return the authenticated user's library, loading it on first use.
+
+    Cached libraries first catch up with what other processes wrote to them.
+    """
+    library = state.libraries.get(user_id, load=False)
+    if library is None:
+        return await executor.read(state.libraries.get, user_id)
+
+    await library.sync.refresh()
+    return library
+
 
 # ====== MATCHES: MAIN GAME LOOP
 
@@ -41,14 +97,17 @@ class MatchResult(BaseModel):
 
 
 @app.get("/brawl")
-def get_match(_user_id: str = Depends(get_current_user)):
+async def get_match(library: Library = Depends(get_library)):
     """Return two books to face off"""
-    if len(state.books) < 2:
+    if len(library.books) < 2:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough books"
         )
 
-    book_a, book_b = select_opponents(state.books)
+    pair = library.matches.pop(draw=False)
+    if pair is None:
+        pair = await executor.read(library.matches.pop)
+    book_a, book_b = pair
     return {
         "book_a": {
             "id": book_a.id,
@@ -64,19 +123,17 @@ def get_match(_user_id: str = Depends(get_current_user)):
 
 
 @app.post("/brawl/resolve")
-def post_match(result: MatchResult, _user_id: str = Depends(get_current_user)):
+async def post_match(result: MatchResult, library: Library = Depends(get_library)):
     """Resolve a match between two books and update their records."""
-    book_map = {b.id: b for b in state.books}
-
-    winner = book_map.get(result.winner_id)
-    loser = book_map.get(result.loser_id)
+    winner = library.get(result.winner_id)
+    loser = library.get(result.loser_id)
 
     if not (winner and loser):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Books not found"
         )
 
-    resolve_comparison(winner, loser, state.books)
+    await library.actor.call(resolve_match, winner, loser)
 
     return {"status": "ok", "winner": winner.id, "loser": loser.id}
 
@@ -85,26 +142,79 @@ def post_match(result: MatchResult, _user_id: str = Depends(get_current_user)):
 
 
 @app.get("/progress")
-def get_progress(_user_id: str = Depends(get_current_user)):
+async def get_progress(
+    request: Request, response: Response, library: Library = Depends(get_library)
+):
     """Return the user's overall progress in the game."""
+    not_modified = _check_etag(request, library)
+    if not_modified:
+        return not_modified
+
+    snapshot, progress = await library.actor.read(library_service.progress)
+    _tag(response, snapshot)
     return {
-        "progress": round(calculate_progress(state.books), 4),
-        "book_count": len(state.books),
+        "progress": round(progress, 4),
+        "book_count": snapshot.book_count,
     }
 
 
 @app.get("/leaderboard")
-def get_leaderboard(_user_id: str = Depends(get_current_user)):
-    ranked_books = rank_books(state.books)
-    return [
-        {
-            "rank": rank,
-            "title": book.title,
-            "author": book.author,
-            "accuracy": round(confidence_score(book, state.books), 4),
-        }
-        for rank, book in ranked_books
-    ]
+async def get_leaderboard(
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1),
+    around: int | None = None,
+    library: Library = Depends(get_library),
+):
+    """Return ranked books from offset, limit at a time (all of them by default).
+
+    If around is a book ID, return the page centered on that book instead, with
+    LEADERBOARD_PAGE_SIZE books unless a limit is given. The total number of books is
+    sent in X-Total-Count.
+    """
+    not_modified = _check_etag(request, library)
+    if not_modified:
+        return not_modified
+
+    snapshot, rows = await library.actor.read(
+        library_service.leaderboard_page, offset, limit, around
+    )
+    if rows is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+        )
+
+    _tag(response, snapshot)
+    response.headers["X-Total-Count"] = str(snapshot.book_count)
+    return rows
+
+
+def _check_etag(request, library):
+    """Return a 304 response if the client's If-None-Match has the library's ETag.
+
+    Lets read endpoints skip building a snapshot altogether. Otherwise, return None.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+
+    etag = f'"{library.etag}"'
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in tags or etag in tags:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=_cache_headers(etag)
+        )
+    return None
+
+
+def _tag(response, snapshot):
+    """Tag the response with the snapshot's ETag, for clients to revalidate with."""
+    response.headers.update(_cache_headers(f'"{snapshot.etag}"'))
+
+
+def _cache_headers(etag):
+    return {"ETag": f"W/{etag}", "Cache-Control": "private, no-cache"}
 
 
 # ====== BOOK INSERTIONS
@@ -117,50 +227,78 @@ class BookData(BaseModel):
 
 
 @app.post("/books")
-def add_book(book: BookData, _user_id: str = Depends(get_current_user)):
+async def add_book(book: BookData, library: Library = Depends(get_library)):
     """Add a new book to the collection."""
-    existing_books = {(b.title.lower(), b.author.lower()) for b in state.books}
-
-    if (book.title.lower(), book.author.lower()) in existing_books:
-        raise HTTPException(status_code=409, detail="Book already exists")
-
     new_book = Book(title=book.title, author=book.author, rating=book.rating)
 
     try:
-        books_repo.insert(new_book)
+        added = await library.actor.call(library_service.add_book, new_book)
     except sqlite3.IntegrityError:
+        added = False
+    if not added:
         raise HTTPException(status_code=409, detail="Book already exists")
 
-    state.books.append(new_book)
-
     return {"id": new_book.id, "title": new_book.title, "author": new_book.author}
 
 
-@app.post("/books/import")
-def import_books(file: UploadFile, _user_id: str = Depends(get_current_user)):
-    """Import books from a CSV file."""
+@app.post("/books/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_books(file: UploadFile, library: Library = Depends(get_library)):
+    """Start importing books from a CSV file in the background.
+
+    Return the import job's ID, to poll its progress at /books/import/{job_id}.
+    """
     if not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="Invalid file type")
 
-    content = file.file.read().decode("utf-8")
-    reader = csv.DictReader(io.StringIO(content))
+    path = await run_in_threadpool(_spool_csv, file)
+    job = state.import_jobs.submit(path, library)
 
-    if not reader.fieldnames:
-        raise HTTPException(status_code=400, detail="CSV file is empty")
+    return job.progress()
 
-    reader.fieldnames = [f.lower().strip() for f in reader.fieldnames]
-    if "title" not in reader.fieldnames or "author" not in reader.fieldnames:
-        raise HTTPException(status_code=400, detail="CSV file missing required columns")
 
-    result = library_service.import_books(reader, state.books)
+@app.get("/books/import/{job_id}")
+async def get_import(job_id: str, user_id: int = Depends(get_user_id)):
+    """Return the progress of an import job."""
+    job = state.import_jobs.get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Import job not found")
 
-    state.books.extend(result.new_books)
+    return job.progress()
 
-    return {
-        "imported": len(result.new_books),
-        "skipped": result.skipped,
-        "interrupted": result.interrupted,
-    }
+
+def _spool_csv(file):
+    """Spool an uploaded CSV to a temporary file, once its header checks out.
+
+    The upload is closed once the request ends, so the import job reads the copy.
+    Return the copy's path.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as upload:
+        shutil.copyfileobj(file.file, upload)
+
+    try:
+        _check_csv_header(upload.name)
+    except HTTPException:
+        os.remove(upload.name)
+        raise
+
+    return upload.name
+
+
+def _check_csv_header(path):
+    with open(path, newline="", encoding="utf-8") as file:
+        try:
+            fieldnames = csv.DictReader(file).fieldnames
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=400, detail="CSV file must be UTF-8 encoded"
+            )
+
+    if not fieldnames:
+        raise HTTPException(status_code=400, detail="CSV file is empty")
+
+    fieldnames = [f.lower().strip() for f in fieldnames]
+    if "title" not in fieldnames or "author" not in fieldnames:
+        raise HTTPException(status_code=400, detail="CSV file missing required columns")
 
 
 # ====== USERS
@@ -172,13 +310,15 @@ class UserSync(BaseModel):
 
 
 @app.post("/readers")
-def sync_user(data: UserSync, clerk_id: str = Depends(get_current_user)):
+async def sync_user(data: UserSync, clerk_id: str = Depends(get_current_user)):
     """Create a new user record on the first login or return an existing one."""
-    user = users_repo.get_by_clerk_id(clerk_id)
+    user = await executor.read(users_repo.get_by_clerk_id, clerk_id)
 
     if not user:
         try:
-            user_id = users_repo.insert(clerk_id, data.email, data.username)
+            user_id = await executor.write(
+                users_repo.insert, clerk_id, data.email, data.username
+            )
         except sqlite3.IntegrityError:
             raise HTTPException(status_code=409, detail="User already exists")
         return {"id": user_id, "clerk_id": clerk_id, "created": True}
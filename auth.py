@@ -1,5 +1,11 @@
 """Handles user authentication using Clerk JWTs."""
 
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import anyio
 import jwt
 import requests
 from fastapi import HTTPException, status
@@ -7,7 +13,7 @@ from fastapi.params import Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jwt.algorithms import RSAAlgorithm
 
-from config import CLERK_JWKS_URL
+from config import CLERK_JWKS_URL, JWKS_CACHE_TTL, TOKEN_CACHE_SIZE
 
 if not CLERK_JWKS_URL:
     raise RuntimeError(
@@ -18,23 +24,30 @@ if not CLERK_JWKS_URL:
 bearer_scheme = HTTPBearer()
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ):
     """Verify the JWT and return the Clerk user ID.
 
-    Inject this into every endpoint that requires authentication.
+    Inject this into every endpoint that requires authentication. Tokens verified
+    before are served from the token cache until they expire.
     """
     token = credentials.credentials
 
+    cached_sub = token_cache.get(token)
+    if cached_sub is not None:
+        return cached_sub
+
     try:
-        public_key = _get_public_key(token)  # Get the matching Clerk public key
+        public_key = await _get_public_key(token)  # Get the matching Clerk public key
         payload = jwt.decode(
             token, public_key, algorithms=["RS256"], options={"verify_audience": False}
         )  # Use the public key to first verify JWT is genuine, then decode (unpack) it the JWT
         sub = payload.get("sub")  # Extract the user ID (which lives in the "sub" claim)
         if not sub:
             raise HTTPException(status_code=401, detail="Token missing required claim")
+
+        token_cache.put(token, sub, payload.get("exp"))
         return sub  # Clerk user ID lives in the "sub" claim
 
     except jwt.ExpiredSignatureError:
@@ -47,10 +60,8 @@ def get_current_user(
         )
 
 
-def _get_public_key(token):
+async def _get_public_key(token):
     """Find the matching public key for the given token from Clerk's JWKS."""
-    jwks = _get_jwks()
-
     # Extract the metadata (header) from the yet unverified JWT
     headers = jwt.get_unverified_header(token)
 
@@ -58,17 +69,138 @@ def _get_public_key(token):
     if not headers_kid:
         raise HTTPException(status_code=401, detail="Invalid token: missing kid")
 
-    for key in jwks["keys"]:
-        if key.get("kid") == headers_kid:  # Find the matching key
-            return RSAAlgorithm.from_jwk(key)  # Convert the JWK to a public key object
+    public_key = await jwks_cache.get_key(headers_kid)
+    if public_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No matching public key found",
+        )
 
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED, detail="No matching public key found"
-    )
+    return public_key
+
+
+class JWKSCache:
+    """In-process cache of parsed JWKS public keys, keyed by kid.
+
+    Keys are refetched once the TTL lapses, or when a token names an unknown kid
+    (e.g., after Clerk rotates its keys). Fetches run on a worker thread, so they never
+    block the event loop. Only one thread fetches at a time; others wait and reuse its
+    result. If a refresh fails, the previous keys keep serving.
+    """
+
+    FETCH_TIMEOUT = 5  # seconds
+    MIN_REFRESH_INTERVAL = 30  # seconds between fetches once keys are loaded
+
+    def __init__(self, url, ttl=JWKS_CACHE_TTL):
+        self.url = url
+        self.ttl = ttl
+        self._keys = {}  # {kid: public key}
+        self._fetched_at = None  # time.monotonic() of the last successful fetch
+        self._attempted_at = None  # time.monotonic() of the last fetch attempt
+        self._attempts = 0
+        self._lock = threading.Lock()
+
+    async def get_key(self, kid):
+        """Return the public key for kid, refreshing the key set if needed."""
+        seen_attempts = self._attempts
+        key = self._keys.get(kid)
+
+        if key is not None and not self._expired():
+            return key
+
+        await anyio.to_thread.run_sync(self._refresh, seen_attempts)
+        return self._keys.get(kid)
 
+    def _expired(self):
+        return (
+            self._fetched_at is None or time.monotonic() - self._fetched_at >= self.ttl
+        )
 
-def _get_jwks():
+    def _refresh(self, seen_attempts):
+        with self._lock:
+            # Another thread fetched (or tried to) while this one waited for the lock
+            if self._attempts != seen_attempts:
+                return
+
+            # Once keys are loaded, don't let made-up kids or a failing endpoint
+            # trigger a fetch on every request
+            now = time.monotonic()
+            if self._keys and now - self._attempted_at < self.MIN_REFRESH_INTERVAL:
+                return
+
+            self._attempts += 1
+            self._attempted_at = now
+            try:
+                jwks = _get_jwks(self.url, self.FETCH_TIMEOUT)
+            except requests.RequestException:
+                if not self._keys:
+                    raise
+                return  # Serve stale keys rather than failing every request
+
+            self._keys = {
+                key["kid"]: RSAAlgorithm.from_jwk(
+                    key
+                )  # Convert the JWK to a key object
+                for key in jwks["keys"]
+                if key.get("kid") and key.get("kty") == "RSA"
+            }
+            self._fetched_at = time.monotonic()
+
+
+def _get_jwks(url=CLERK_JWKS_URL, timeout=None):
     """Fetch Clerk's public keys (JWKS) for JWT verification."""
-    response = requests.get(CLERK_JWKS_URL)
+    response = requests.get(url, timeout=timeout)
     response.raise_for_status()  # Raise an exception if there's an HTTP error
     return response.json()
+
+
+class TokenCache:
+    """Bounded LRU cache of verified tokens, mapping a token's hash to its sub and exp.
+
+    Entries are dropped once the token expires, so a cached token is never accepted
+    past its exp claim. Tokens without an exp are not cached.
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {token hash: (sub, exp)}
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Return the cached sub for a verified, unexpired token, or None."""
+        key = _token_hash(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() >= entry[1]:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token, sub, exp):
+        if exp is None or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[_token_hash(token)] = (sub, exp)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)  # Evict the least recently used
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).digest()
+
+
+jwks_cache = JWKSCache(CLERK_JWKS_URL)
+token_cache = TokenCache()
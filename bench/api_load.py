@@ -0,0 +1,174 @@
+"""Load benchmark for the API: throughput, latency, and threads under concurrency.
+
+Serves the app with uvicorn on a scratch database, opens a number of idle keep-alive
+connections, then has concurrent clients play the game (GET /brawl, POST
+/brawl/resolve) and poll /progress and /leaderboard. Authentication is bypassed,
+so the numbers cover the app itself. Prints the results as JSON.
+
+Usage:
+    python bench/api_load.py [--books 500] [--clients 200] [--requests 4000]
+                             [--idle 1000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CLERK_JWKS_URL", "http://localhost/unused")
+
+import uvicorn  # noqa: E402
+
+import state  # noqa: E402
+
+CLERK_ID = "bench"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--idle", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        state.db_path = os.path.join(tmp, "bench.db")
+        results = run(args)
+
+    print(json.dumps(results, indent=2))
+
+
+def run(args):
+    import api
+    from auth import get_current_user
+    from db import books_repo, users_repo
+    from db.connection import init_db
+    from models import Book
+
+    init_db(state.db_path)
+    user_id = users_repo.insert(CLERK_ID, "bench@example.com", "bench")
+    books_repo.insert_many(
+        [Book(f"Book {i}", "Author", random.uniform(1, 10)) for i in range(args.books)],
+        user_id,
+    )
+
+    async def bench_user():
+        return CLERK_ID
+
+    api.app.dependency_overrides[get_current_user] = bench_user
+
+    server = uvicorn.Server(
+        uvicorn.Config(api.app, port=0, log_level="warning", backlog=4096)
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    try:
+        return asyncio.run(_load(port, args))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+async def _load(port, args):
+    idle = [await asyncio.open_connection("127.0.0.1", port) for _ in range(args.idle)]
+    for reader, writer in idle:
+        await _request(reader, writer, "GET", "/progress")
+
+    latencies = []
+    peak_threads = threading.active_count()
+    remaining = args.requests
+
+    async def client():
+        nonlocal remaining, peak_threads
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await _play(reader, writer)
+            latencies.append(time.perf_counter() - start)
+            peak_threads = max(peak_threads, threading.active_count())
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    for _, writer in idle:
+        writer.close()
+
+    latencies.sort()
+    return {
+        "books": args.books,
+        "clients": args.clients,
+        "idle_connections": args.idle,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p90": round(_percentile(latencies, 0.90) * 1000, 2),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+        },
+        "peak_threads": peak_threads,
+    }
+
+
+async def _play(reader, writer):
+    """Send one request from the game's mix: mostly matches, some polling."""
+    roll = random.random()
+    if roll < 0.4:
+        await _request(reader, writer, "GET", "/brawl")
+    elif roll < 0.7:
+        match = json.loads(await _request(reader, writer, "GET", "/brawl"))
+        winner, loser = match["book_a"]["id"], match["book_b"]["id"]
+        body = json.dumps({"winner_id": winner, "loser_id": loser})
+        await _request(reader, writer, "POST", "/brawl/resolve", body)
+    elif roll < 0.85:
+        await _request(reader, writer, "GET", "/progress")
+    else:
+        await _request(reader, writer, "GET", "/leaderboard?limit=20")
+
+
+async def _request(reader, writer, method, path, body=""):
+    """Send an HTTP/1.1 request on a keep-alive connection and return its body."""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: bench\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        f"{body}".encode()
+    )
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = next(
+        int(line.split(b":", 1)[1])
+        for line in head.split(b"\r\n")
+        if line.lower().startswith(b"content-length:")
+    )
+    payload = await reader.readexactly(length)
+    if status >= 400:
+        raise RuntimeError(f"{method} {path} failed with {status}: {payload!r}")
+    return payload
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[
+        min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Benchmark for the scoring, selection, ranking, and persistence hot paths.
+
+For each library size, builds a synthetic library on a scratch database: books with a
+spread of ratings (some unrated), and a comparison history played out in rounds of
+Elo-close pairings, won by whichever book is secretly stronger, more often than not.
+Then times each hot path on it and prints the results as JSON, to compare runs
+against each other.
+
+Usage:
+    python bench/hot_paths.py [--sizes 100,500,2000,20000] [--matches-per-book 6]
+                              [--repeat 5] [--calls 500]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import state  # noqa: E402
+
+K = 32  # Fixed K for the synthetic history, within the range of the app's K_TIERS
+UNRATED_SHARE = 0.1  # Books imported without a rating
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,500,2000,20000")
+    parser.add_argument("--matches-per-book", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "matches_per_book": args.matches_per_book,
+        "repeat": args.repeat,
+        "calls": args.calls,
+        "libraries": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            state.db_path = os.path.join(tmp, f"bench-{size}.db")
+            results["libraries"].append(run(size, args))
+
+    print(json.dumps(results, indent=2))
+
+
+def run(size, args):
+    from config import BOOK_LIMIT
+    from db import books_repo
+    from db.connection import close_connections, init_db
+    from services.game_service import resolve_comparison, select_opponents
+    from services.library import Library
+    from services.library_service import import_books
+    from services.ranking_service import rank_books
+    from services.scoring_service import calculate_progress, score_breakdown
+
+    rng = random.Random(args.seed)
+    init_db(state.db_path)
+    user_id, comparisons = _seed_library(size, args.matches_per_book, rng)
+
+    library = Library.load(user_id)
+    books = library.books
+    scoring = library.scoring
+
+    # Inputs are drawn up front, so only the calls themselves are timed. Imports stop
+    # at BOOK_LIMIT books, so larger sizes import that many.
+    repeat = [()] * args.repeat
+    sampled = [(book, books) for book in rng.choices(books, k=args.calls)]
+    pairs = [select_opponents(scoring) for _ in range(args.calls)]
+    matches = [(a, b, library, rng.choice("12")) for a, b in pairs]
+    import_size = min(size, BOOK_LIMIT)
+    imports = [_import_args(import_size, rng) for _ in range(args.repeat)]
+
+    timings = {
+        "books_repo.get_all": _time(lambda: books_repo.get_all(user_id), repeat),
+        "calculate_progress": _time(lambda: calculate_progress(books), repeat),
+        "rank_books": _time(lambda: rank_books(books), repeat),
+        "score_breakdown": _time(score_breakdown, sampled),
+        "select_opponents": _time(lambda: select_opponents(scoring), [()] * args.calls),
+        "resolve_comparison": _time(resolve_comparison, matches),
+        "library_service.import_books": _time(import_books, imports),
+    }
+    timings["library_service.import_books"]["rows"] = import_size
+    close_connections()
+
+    return {"books": size, "comparisons": comparisons, "timings": timings}
+
+
+def _seed_library(size, matches_per_book, rng):
+    """Save a synthetic library with a played-out history.
+
+    Return (user_id, number of comparisons).
+    """
+    from db import books_repo, users_repo
+    from db.comparison_summary import insert_comparisons
+    from db.connection import get_connection
+
+    user_id = users_repo.insert(f"bench-{size}", f"{size}@example.com", f"b{size}")
+    books = _books(size, rng, "Book")
+    books_repo.insert_many(books, user_id)
+
+    # Hidden strength: mostly what the rating says, partly what the user didn't know
+    strengths = {
+        b.id: (b.rating if b.rating is not None else 5.5) * 40 + rng.gauss(0, 60)
+        for b in books
+    }
+    elos = {b.id: b.elo for b in books}
+    matches = []
+    for _ in range(matches_per_book):
+        # Pair books close in Elo, as matchmaking favors, with some noise
+        ordered = sorted(books, key=lambda b: elos[b.id] + rng.gauss(0, 50))
+        for a, b in zip(ordered[::2], ordered[1::2]):
+            a_wins = rng.random() < _expected_score(strengths[a.id], strengths[b.id])
+            winner, loser = (a, b) if a_wins else (b, a)
+            expected = _expected_score(elos[winner.id], elos[loser.id])
+            elos[winner.id] = round(elos[winner.id] + K * (1 - expected))
+            elos[loser.id] = round(elos[loser.id] - K * (1 - expected))
+            matches.append((user_id, winner.id, loser.id, None))
+
+    with get_connection() as conn:
+        insert_comparisons(conn, matches)
+        conn.executemany(
+            "UPDATE book SET elo = ? WHERE id = ?",
+            [(elo, book_id) for book_id, elo in elos.items()],
+        )
+
+    return user_id, len(matches)
+
+
+def _expected_score(elo_a, elo_b):
+    return 1 / (1 + 10 ** ((elo_b - elo_a) / 400))
+
+
+def _books(size, rng, prefix):
+    from models import Book
+
+    return [
+        Book(
+            f"{prefix} {i}",
+            f"Author {i % max(1, size // 4)}",
+            None if rng.random() < UNRATED_SHARE else round(rng.uniform(1, 10), 1),
+        )
+        for i in range(size)
+    ]
+
+
+def _import_args(size, rng):
+    """Return (CSV reader, empty library) to import size new books with."""
+    from db import users_repo
+    from services.library import Library
+
+    tag = f"import-{rng.getrandbits(64):x}"
+    user_id = users_repo.insert(tag, f"{tag}@example.com", tag)
+
+    rows = io.StringIO()
+    writer = csv.writer(rows)
+    writer.writerow(["title", "author", "rating"])
+    for book in _books(size, rng, "Imported"):
+        writer.writerow([book.title, book.author, book.rating or ""])
+    rows.seek(0)
+
+    return csv.DictReader(rows), Library(user_id=user_id)
+
+
+def _time(fn, calls):
+    """Call fn with each tuple of arguments in calls, and return its timings in ms."""
+    times = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "calls": len(calls),
+        "mean_ms": round(statistics.fmean(times), 4),
+        "median_ms": round(statistics.median(times), 4),
+        "min_ms": round(min(times), 4),
+        "max_ms": round(max(times), 4),
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,45 @@ load_dotenv()
 
 BOOK_LIMIT = 2000
 DEFAULT_RATING = 6.2
+IMPORT_CHUNK_SIZE = 500  # CSV rows validated and inserted per transaction
+
+# ====== API IMPORT JOBS
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 2))  # imports running at once
+IMPORT_JOB_TTL = float(os.getenv("IMPORT_JOB_TTL", 3600))  # seconds kept once done
+
+# ====== API LEADERBOARD
+
+LEADERBOARD_PAGE_SIZE = 50  # books around a given book when no limit is set
+
+# ====== API MATCH QUEUE
+
+# Opponent pairs drawn ahead for GET /brawl (see services/match_queue.py)
+MATCH_QUEUE_SIZE = int(os.getenv("MATCH_QUEUE_SIZE", 8))  # pairs
+MATCH_QUEUE_REFILL_AT = int(os.getenv("MATCH_QUEUE_REFILL_AT", 3))  # pairs left
+MATCH_QUEUE_MAX_LAG = int(os.getenv("MATCH_QUEUE_MAX_LAG", 5))  # library changes
+
+# ====== API LIBRARY CACHE
+
+# Per-user libraries kept in memory by the API (see services/library.py)
+LIBRARY_CACHE_MAX_BOOKS = int(os.getenv("LIBRARY_CACHE_MAX_BOOKS", 50000))  # books
+LIBRARY_IDLE_TTL = float(os.getenv("LIBRARY_IDLE_TTL", 1800))  # seconds
+LIBRARY_ACTOR_THREADS = int(os.getenv("LIBRARY_ACTOR_THREADS", 4))  # changes at once
+LIBRARY_SNAPSHOT_READS = int(os.getenv("LIBRARY_SNAPSHOT_READS", 64))  # pages kept
+# Seconds between checks for other processes' writes (see services/library_sync.py)
+LIBRARY_SYNC_INTERVAL = float(os.getenv("LIBRARY_SYNC_INTERVAL", 0.5))
+
+# ====== PERSISTENCE
+
+# Batch match writes in memory (see db/write_behind.py). Always on for the terminal.
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 50))  # matches
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", 5))  # seconds
+DB_READ_THREADS = int(os.getenv("DB_READ_THREADS", 4))  # API reads running at once
 
 # ====== CLERK AUTH
 
 CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
 CLERK_JWKS_URL = os.getenv("CLERK_JWKS_URL")
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", 3600))  # seconds
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))  # verified tokens kept
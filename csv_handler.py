@@ -29,7 +29,7 @@ def csv_reader(prompt=" CSV file path: ", back_key="q"):
         return filepath
 
 
-def import_from_csv(filepath, books):
+def import_from_csv(filepath, library):
     """Import books from a CSV, skipping any already in the system.
 
     Return a list of books imported (empty if import failed or no books were added) and
@@ -49,7 +49,8 @@ def import_from_csv(filepath, books):
                 print(f"{PROMPT}{style('ERROR! Missing required columns.', ERROR)}")
                 return [], False
 
-            result = import_books(reader, books)
+            result = import_books(reader, library, on_progress=_print_progress)
+            print()
 
     except FileNotFoundError:
         print(f"{PROMPT}{style('ERROR! Could not find file at:', ERROR)}")
@@ -66,6 +67,15 @@ def import_from_csv(filepath, books):
     return result.new_books, result.interrupted
 
 
+def _print_progress(result):
+    """Show an import's progress, updating the same line after each chunk."""
+    progress = (
+        f"{result.processed} rows read, {len(result.new_books)} new,"
+        f" {result.skipped} skipped, {len(result.errors)} invalid"
+    )
+    print(f"\r{PROMPT}{style(progress, SECONDARY)}", end="", flush=True)
+
+
 def export_to_csv(books):
     """Export all books with their current rankings, as a CSV file."""
     exports_dir = "exports"
@@ -1,16 +1,35 @@
+from db import changes_repo, comparison_summary, write_behind
 from db.connection import get_connection
-from models import Book
+from models import Book, EloIndex, MatchHistory
 
 
-def get_all():
-    """Load all books, set their opponent/wins history, and set global Elo min/max."""
-    Book.elo_min = 800
-    Book.elo_max = 1200
+def get_all(user_id=None):
+    """Load a user's books and set their opponent/wins history.
+
+    Books without a user (i.e., the terminal app's library) are loaded when user_id is
+    None. Loaded books share one MatchHistory, and are linked to a shared EloIndex,
+    which answers window queries and holds the library's Elo bounds.
+    """
+    return load(user_id)[0]
+
+
+def load(user_id=None):
+    """Like get_all(), but return (books, watermark).
+
+    The watermark (see changes_repo) is read in the same transaction as the books, so
+    changes_since() picks up exactly what was written after them.
+    """
+    write_behind.flush()
 
     with get_connection() as conn:
+        conn.execute("BEGIN")
+        watermark = changes_repo.watermark(user_id, conn)
         rows = conn.execute(
             "SELECT id, title, author, rating, elo FROM book"
+            " WHERE user_id IS ? ORDER BY id",
+            (user_id,),
         ).fetchall()
+        pairs = comparison_summary.load(conn, user_id)
 
     books = []
     for row in rows:
@@ -21,35 +40,39 @@ def get_all():
             elo=row["elo"],
             book_id=row["id"],
         )
-        if book.elo < Book.elo_min:
-            Book.elo_min = book.elo
-        if book.elo > Book.elo_max:
-            Book.elo_max = book.elo
         books.append(book)
 
-    book_map = {b.id: b for b in books}
-    with get_connection() as conn:
-        rows = conn.execute("SELECT winner_id, loser_id FROM comparison").fetchall()
-        for row in rows:
-            w_id, l_id = row["winner_id"], row["loser_id"]
-            book_map[w_id].record_opponent(l_id)
-            book_map[l_id].record_opponent(w_id)
-            book_map[w_id].record_won_over(l_id)
+    MatchHistory(books).load(pairs)
 
-    return books
+    EloIndex(books)
 
+    return books, watermark
 
-def insert(book):
-    """Insert a new book and set its ID."""
+
+def insert(book, user_id=None):
+    """Insert a new book for the given user and set its ID."""
     with get_connection() as conn:
         cursor = conn.execute(
-            "INSERT INTO book (title, author, rating, elo) VALUES (?, ?, ?, ?)",
-            (book.title, book.author, book.rating, book.elo),
+            "INSERT INTO book (user_id, title, author, rating, elo)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (user_id, book.title, book.author, book.rating, book.elo),
         )
         book.id = cursor.lastrowid
 
 
-def update_elo(book):
-    """Update the Elo score for a book."""
+def insert_many(books, user_id=None):
+    """Insert new books for the given user in one transaction and set their IDs."""
+    if not books:
+        return
+
     with get_connection() as conn:
-        conn.execute("UPDATE book SET elo = ? WHERE id = ?", (book.elo, book.id))
+        conn.executemany(
+            "INSERT INTO book (user_id, title, author, rating, elo)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [(user_id, b.title, b.author, b.rating, b.elo) for b in books],
+        )
+        # IDs are assigned consecutively, since the transaction holds the write lock
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    for book_id, book in enumerate(books, start=last_id - len(books) + 1):
+        book.id = book_id
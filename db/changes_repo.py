@@ -0,0 +1,61 @@
+"""Change counters, to keep libraries loaded by several processes in sync.
+
+A user's watermark is their (last comparison ID, last book ID). IDs only ever grow,
+so a newer watermark means someone wrote since, and the rows past the old watermark
+are exactly what changed. Both halves are a single index lookup.
+"""
+
+from db.connection import get_connection
+
+WATERMARK_QUERY = """
+    SELECT
+        (SELECT COALESCE(MAX(id), 0) FROM comparison WHERE user_id IS ?),
+        (SELECT COALESCE(MAX(id), 0) FROM book WHERE user_id IS ?)
+"""
+
+
+def watermark(user_id, conn=None):
+    """Return the user's current (last comparison ID, last book ID)."""
+    if conn is not None:
+        return tuple(conn.execute(WATERMARK_QUERY, (user_id, user_id)).fetchone())
+
+    with get_connection() as own:
+        return tuple(own.execute(WATERMARK_QUERY, (user_id, user_id)).fetchone())
+
+
+def changes_since(user_id, since):
+    """Return what was written for the user past the since watermark.
+
+    Return (books, comparisons, elos, watermark): new book rows, (winner_id, loser_id)
+    rows in the order they were played, the current {book_id: elo} of every book in
+    those comparisons, and the watermark they bring the caller up to. Everything is
+    read in one transaction, so the watermark covers exactly what's returned.
+    """
+    last_comparison_id, last_book_id = since
+    with get_connection() as conn:
+        conn.execute("BEGIN")
+        new_watermark = watermark(user_id, conn)
+        books = conn.execute(
+            "SELECT id, title, author, rating, elo FROM book"
+            " WHERE user_id IS ? AND id > ? ORDER BY id",
+            (user_id, last_book_id),
+        ).fetchall()
+        comparisons = conn.execute(
+            "SELECT winner_id, loser_id FROM comparison"
+            " WHERE user_id IS ? AND id > ? ORDER BY id",
+            (user_id, last_comparison_id),
+        ).fetchall()
+        elos = conn.execute(
+            "SELECT id, elo FROM book WHERE id IN ("
+            "  SELECT winner_id FROM comparison WHERE user_id IS ? AND id > ?"
+            "  UNION SELECT loser_id FROM comparison WHERE user_id IS ? AND id > ?"
+            ")",
+            (user_id, last_comparison_id, user_id, last_comparison_id),
+        ).fetchall()
+
+    return (
+        books,
+        [tuple(row) for row in comparisons],
+        {row["id"]: row["elo"] for row in elos},
+        new_watermark,
+    )
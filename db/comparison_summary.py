@@ -0,0 +1,90 @@
+"""Per-pair comparison counts, kept in step with the comparison table.
+
+Loading a library from the summary reads one row per distinct (winner, loser) pair
+instead of one row per match. Every write path inserts comparisons through
+insert_comparisons(), which folds them into the summary in the same transaction and
+advances a watermark: the last comparison ID the summary covers.
+
+Comparisons written any other way (e.g., by an older version of the app) leave the
+watermark behind, and the summary is rebuilt from the comparison table on next load.
+"""
+
+from collections import Counter
+
+
+def insert_comparisons(conn, comparisons):
+    """Insert comparisons and add them to the summary, in the caller's transaction.
+
+    Comparisons are (user_id, winner_id, loser_id, timestamp) rows, where a timestamp
+    of None means now.
+    """
+    if not comparisons:
+        return
+
+    conn.executemany(
+        "INSERT INTO comparison (user_id, winner_id, loser_id, timestamp)"
+        " VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+        comparisons,
+    )
+    # IDs are assigned consecutively, since the transaction holds the write lock
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    first_id = last_id - len(comparisons) + 1
+
+    counts = Counter((user_id, w_id, l_id) for user_id, w_id, l_id, _ in comparisons)
+    conn.executemany(
+        "INSERT INTO comparison_summary (user_id, winner_id, loser_id, count)"
+        " VALUES (?, ?, ?, ?) ON CONFLICT (winner_id, loser_id)"
+        " DO UPDATE SET count = count + excluded.count",
+        [(*pair, count) for pair, count in counts.items()],
+    )
+
+    # Only advance the watermark if the summary covered every comparison before these
+    conn.execute(
+        "UPDATE comparison_summary_state SET last_comparison_id = ?"
+        " WHERE last_comparison_id = ?",
+        (last_id, first_id - 1),
+    )
+
+
+def load(conn, user_id):
+    """Return a user's (winner_id, loser_id, count) rows, rebuilding them if stale.
+
+    Rows are plain tuples, since a library can have hundreds of thousands of pairs.
+    """
+    if is_stale(conn):
+        rebuild(conn)
+
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute(
+        "SELECT winner_id, loser_id, count FROM comparison_summary WHERE user_id IS ?",
+        (user_id,),
+    ).fetchall()
+
+
+def is_stale(conn):
+    """Return whether comparisons exist past the summary's watermark."""
+    row = conn.execute("""
+        SELECT
+            (SELECT last_comparison_id FROM comparison_summary_state) AS watermark,
+            (SELECT COALESCE(MAX(id), 0) FROM comparison) AS last_id
+    """).fetchone()
+    return row["last_id"] > row["watermark"]
+
+
+def rebuild(conn):
+    """Recount the whole summary from the comparison table."""
+    conn.execute("DELETE FROM comparison_summary")
+    conn.execute("""
+        INSERT INTO comparison_summary (user_id, winner_id, loser_id, count)
+        SELECT MAX(user_id), winner_id, loser_id, COUNT(*)
+        FROM comparison
+        GROUP BY winner_id, loser_id
+    """)
+    # Cover IDs used by deleted comparisons too, so the next insert lines up
+    conn.execute("""
+        UPDATE comparison_summary_state SET last_comparison_id = MAX(
+            (SELECT COALESCE(MAX(id), 0) FROM comparison),
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'comparison'), 0)
+        )
+    """)
@@ -1,9 +1,32 @@
+from db import write_behind
+from db.comparison_summary import insert_comparisons
 from db.connection import get_connection
 
 
-def insert(winner_id, loser_id):
+def record_match(
+    winner_id, loser_id, winner_elo, loser_elo, user_id=None, return_elos=False
+):
+    """Persist a match in a single transaction: the comparison and both new Elos.
+
+    If return_elos is set, return the (winner, loser) Elo scores as stored. When
+    write-behind batching is enabled, the match is queued instead.
+    """
+    queue = write_behind.active()
+    if queue is not None:
+        queue.record_match(user_id, winner_id, loser_id, winner_elo, loser_elo)
+        return (winner_elo, loser_elo) if return_elos else None
+
     with get_connection() as conn:
-        conn.execute(
-            "INSERT INTO comparison (winner_id, loser_id) VALUES (?, ?)",
-            (winner_id, loser_id),
+        insert_comparisons(conn, [(user_id, winner_id, loser_id, None)])
+
+        updates = [(winner_elo, winner_id), (loser_elo, loser_id)]
+        if not return_elos:
+            conn.executemany("UPDATE book SET elo = ? WHERE id = ?", updates)
+            return None
+
+        return tuple(
+            conn.execute(
+                "UPDATE book SET elo = ? WHERE id = ? RETURNING elo", update
+            ).fetchone()["elo"]
+            for update in updates
         )
@@ -1,13 +1,109 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 
 import state
 
+# Applied to every new connection. WAL lets readers run alongside the writer, and
+# synchronous=NORMAL only syncs at checkpoints rather than on every commit.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",  # in KiB, i.e., 8 MB of page cache per connection
+    "PRAGMA mmap_size = 67108864",  # 64 MB
+)
+POOL_MAX_IDLE = 16  # idle connections kept open per database
+CACHED_STATEMENTS = 256  # prepared statements kept per connection
 
+_pools = {}  # {db path: ConnectionPool}
+_pools_lock = threading.Lock()
+
+
+@contextmanager
 def get_connection(path=None):
-    if path is None:
-        path = state.db_path
-    conn = sqlite3.connect(path)
+    """Borrow a pooled connection for the duration of a `with` block.
+
+    Commits when the block exits normally and rolls back on an exception, like using
+    a sqlite3 connection as a context manager, then returns the connection to the
+    pool so its prepared statements are reused by later calls.
+    """
+    pool = _get_pool(state.db_path if path is None else path)
+    conn = pool.acquire()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.release(conn)
+
+
+def close_connections(path=None):
+    """Close pooled connections to path, or to every database if no path is given.
+
+    Call before copying or deleting a database file: closing the last connection
+    checkpoints the WAL back into the main file.
+    """
+    with _pools_lock:
+        paths = [path] if path is not None else list(_pools)
+        pools = [_pools.pop(p) for p in paths if p in _pools]
+
+    for pool in pools:
+        pool.close()
+
+
+class ConnectionPool:
+    """Long-lived connections to one database, shared across threads.
+
+    A connection is only used by one thread at a time, but may move between threads
+    (e.g., FastAPI's thread pool), so connections skip sqlite3's same-thread check.
+    """
+
+    def __init__(self, path, max_idle=POOL_MAX_IDLE):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return _connect(self.path)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+
+        for conn in idle:
+            conn.close()
+
+
+def _get_pool(path):
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def _connect(path):
+    conn = sqlite3.connect(
+        path, check_same_thread=False, cached_statements=CACHED_STATEMENTS
+    )
     conn.row_factory = sqlite3.Row  # allows access by field name instead of just index
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
@@ -43,3 +139,40 @@ def init_db(path):
                 timestamp  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP
             )
         """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS comparison_summary (
+                user_id    INTEGER  REFERENCES user(id),
+                winner_id  INTEGER  NOT NULL REFERENCES book(id),
+                loser_id   INTEGER  NOT NULL REFERENCES book(id),
+                count      INTEGER  NOT NULL,
+                PRIMARY KEY (winner_id, loser_id)
+            ) WITHOUT ROWID
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS comparison_summary_state (
+                last_comparison_id  INTEGER  NOT NULL
+            )
+        """)
+        conn.execute("""
+            INSERT INTO comparison_summary_state (last_comparison_id)
+            SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM comparison_summary_state)
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS write_behind_state (
+                journal     TEXT     PRIMARY KEY,
+                last_batch  INTEGER  NOT NULL
+            )
+        """)
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_book_user ON book(user_id)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_comparison_user ON comparison(user_id)"
+        )
+        # Covering, so loading a library's pairs only reads the index
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_comparison_summary_user"
+            " ON comparison_summary(user_id, winner_id, loser_id, count)"
+        )
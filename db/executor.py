@@ -0,0 +1,45 @@
+"""Run blocking database work off the event loop, for the async API.
+
+Reads go to a small pool of threads, which WAL lets run alongside writes. Writes that
+don't belong to a library (e.g., syncing users) go to a single writer thread, in the
+order they're awaited. A library's own writes (matches, new books) are made by its
+actor instead (see services/library_actor.py), and imports and write-behind flushes
+write from their own threads, so SQLite's write lock is still contended. Contending
+writers wait on sqlite3's busy timeout. Either way, the event loop only awaits a
+future, so idle and waiting requests don't hold a thread each.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DB_READ_THREADS
+
+_writer = None
+_readers = None
+
+
+def start(read_threads=DB_READ_THREADS):
+    """Start the writer thread and the reader pool."""
+    global _writer, _readers
+    if _writer is None:
+        _writer = ThreadPoolExecutor(1, thread_name_prefix="db-writer")
+        _readers = ThreadPoolExecutor(read_threads, thread_name_prefix="db-reader")
+
+
+def stop():
+    """Wait for submitted work to finish, then stop the threads."""
+    global _writer, _readers
+    if _writer is not None:
+        _writer.shutdown(wait=True)
+        _readers.shutdown(wait=True)
+        _writer = _readers = None
+
+
+async def write(fn, *args):
+    """Run fn(*args) on the writer thread and return its result."""
+    return await asyncio.wrap_future(_writer.submit(fn, *args))
+
+
+async def read(fn, *args):
+    """Run fn(*args) on a reader thread and return its result."""
+    return await asyncio.wrap_future(_readers.submit(fn, *args))
@@ -6,6 +6,7 @@ Safe to run multiple times — all changes are guarded with existence checks.
 Usage:
     python db/migrate.py
     python db/migrate.py --db data/demo1.db    # migrate a specific database
+    python db/migrate.py --assign-unowned      # also run step 9, see below
 """
 
 import sqlite3
@@ -28,7 +29,7 @@ def get_indexes(conn):
     return [row[0] for row in rows]
 
 
-def migrate(db_path):
+def migrate(db_path, assign_unowned=False):
     conn = sqlite3.connect(db_path)
     tables = get_tables(conn)
     indexes = get_indexes(conn)
@@ -135,6 +136,62 @@ def migrate(db_path):
         conn.execute("CREATE INDEX idx_comparison_loser ON comparison(loser_id)")
         print("  ✓ Created index: idx_comparison_loser")
 
+    # --- 7. Add the comparison summary tables if missing. The summary starts out
+    # empty and behind, so the app rebuilds it from comparison on the next load.
+    if "comparison_summary" not in tables:
+        conn.execute("""
+            CREATE TABLE comparison_summary (
+                user_id    INTEGER REFERENCES user(id),
+                winner_id  INTEGER NOT NULL REFERENCES book(id),
+                loser_id   INTEGER NOT NULL REFERENCES book(id),
+                count      INTEGER NOT NULL,
+                PRIMARY KEY (winner_id, loser_id)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(
+            "CREATE INDEX idx_comparison_summary_user"
+            " ON comparison_summary(user_id, winner_id, loser_id, count)"
+        )
+        print("  ✓ Created comparison_summary table")
+
+    if "comparison_summary_state" not in tables:
+        conn.execute(
+            "CREATE TABLE comparison_summary_state (last_comparison_id INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO comparison_summary_state (last_comparison_id) VALUES (0)"
+        )
+        print("  ✓ Created comparison_summary_state table")
+
+    # --- 8. Add the write-behind state table if missing
+    if "write_behind_state" not in tables:
+        conn.execute("""
+            CREATE TABLE write_behind_state (
+                journal     TEXT    PRIMARY KEY,
+                last_batch  INTEGER NOT NULL
+            )
+        """)
+        print("  ✓ Created write_behind_state table")
+
+    # --- 9. Give unowned books and matches to the only user. The API used to serve
+    # one shared library and saved it without a user_id, so with exactly one user and
+    # no owned books yet, that library can only be theirs. The terminal app's books
+    # have no user_id either, so this only runs when asked for, on API databases.
+    users = conn.execute("SELECT id FROM user LIMIT 2").fetchall()
+    owned = conn.execute("SELECT 1 FROM book WHERE user_id IS NOT NULL LIMIT 1")
+    unowned = conn.execute("SELECT 1 FROM book WHERE user_id IS NULL LIMIT 1")
+    if len(users) == 1 and not owned.fetchone() and unowned.fetchone():
+        if assign_unowned:
+            for table in ("book", "comparison", "comparison_summary"):
+                conn.execute(
+                    f"UPDATE {table} SET user_id = ? WHERE user_id IS NULL",
+                    (users[0][0],),
+                )
+            print(f"  ✓ Gave unowned books and matches to user {users[0][0]}")
+        else:
+            print("  - Unowned books found: pass --assign-unowned to give them to")
+            print(f"    user {users[0][0]}, unless they're the terminal app's library")
+
     conn.commit()
     conn.close()
     print("Migration complete.\n")
@@ -148,4 +205,4 @@ if __name__ == "__main__":
                 arg.split("=")[-1] if "=" in arg else sys.argv[sys.argv.index(arg) + 1]
             )
 
-    migrate(db_path)
+    migrate(db_path, assign_unowned="--assign-unowned" in sys.argv)
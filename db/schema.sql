@@ -35,8 +35,36 @@ CREATE TABLE IF NOT EXISTS comparison (
 );
 
 
+-- Per-pair comparison counts, maintained alongside comparison (db/comparison_summary.py).
+-- Libraries load from here, so load time scales with distinct pairs, not matches.
+CREATE TABLE IF NOT EXISTS comparison_summary (
+    user_id    INTEGER REFERENCES user(id),
+    winner_id  INTEGER NOT NULL REFERENCES book(id),
+    loser_id   INTEGER NOT NULL REFERENCES book(id),
+    count      INTEGER NOT NULL,
+    PRIMARY KEY (winner_id, loser_id)
+) WITHOUT ROWID;
+
+
+-- Last comparison ID covered by comparison_summary. Behind → summary gets rebuilt.
+CREATE TABLE IF NOT EXISTS comparison_summary_state (
+    last_comparison_id  INTEGER NOT NULL
+);
+INSERT INTO comparison_summary_state (last_comparison_id)
+SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM comparison_summary_state);
+
+
+-- Last write-behind batch flushed from each journal (db/write_behind.py). Journal
+-- entries from later batches are replayed on recovery.
+CREATE TABLE IF NOT EXISTS write_behind_state (
+    journal     TEXT    PRIMARY KEY,
+    last_batch  INTEGER NOT NULL
+);
+
+
 -- Indexes to speed up the frequent queries.
-CREATE INDEX IF NOT EXISTS idx_book_user            ON book(user_id);
-CREATE INDEX IF NOT EXISTS idx_comparison_user      ON comparison(user_id);
-CREATE INDEX IF NOT EXISTS idx_comparison_winner    ON comparison(winner_id);
-CREATE INDEX IF NOT EXISTS idx_comparison_loser     ON comparison(loser_id);
+CREATE INDEX IF NOT EXISTS idx_book_user               ON book(user_id);
+CREATE INDEX IF NOT EXISTS idx_comparison_user         ON comparison(user_id);
+CREATE INDEX IF NOT EXISTS idx_comparison_winner       ON comparison(winner_id);
+CREATE INDEX IF NOT EXISTS idx_comparison_loser        ON comparison(loser_id);
+CREATE INDEX IF NOT EXISTS idx_comparison_summary_user ON comparison_summary(user_id, winner_id, loser_id, count);
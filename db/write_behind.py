@@ -0,0 +1,258 @@
+"""Optional write-behind batching for match results.
+
+While enabled, record_match() buffers comparisons and the latest Elo of each book in
+memory, and flushes them in one batched transaction once WRITE_BEHIND_BATCH_SIZE
+matches are pending or WRITE_BEHIND_INTERVAL seconds have passed.
+
+Every buffered match is first appended to a journal file next to the database,
+tagged with the ID of the batch it will be flushed in. Each flush records its batch
+ID in write_behind_state, in the same transaction as the matches. If the process dies
+before a flush, recover() replays the journal entries past that marker on the next
+start, so at most the matches a crash interrupts mid-write are lost.
+
+Each process writes its own journal and holds a lock on it while running, so with
+several API workers, recover() only replays journals whose process is gone, and a
+flush never truncates another worker's entries.
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import state
+from config import WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_INTERVAL
+from db.comparison_summary import insert_comparisons
+from db.connection import get_connection
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locks, so only one process may batch writes
+    fcntl = None
+
+_queue = None
+
+
+def enable(path=None):
+    """Start batching match writes for the given database (default: state.db_path)."""
+    global _queue
+    if _queue is None:
+        _queue = WriteBehindQueue(path if path is not None else state.db_path)
+    return _queue
+
+
+def disable():
+    """Flush any pending writes and go back to writing every match immediately."""
+    global _queue
+    if _queue is not None:
+        _queue.close()
+        _queue = None
+
+
+def active():
+    """Return the active queue, or None if writes aren't being batched."""
+    return _queue
+
+
+def flush():
+    """Flush pending writes, if any. Call before reading matches from the database."""
+    if _queue is not None:
+        _queue.flush()
+
+
+def recover(path=None):
+    """Replay matches journaled but never flushed, e.g., after a crash.
+
+    Journals still locked by a running process are left to it. Of the others, only
+    entries from batches past the journal's flushed marker are replayed, along with
+    the marker, so replaying a journal twice is harmless. Return the number replayed.
+    """
+    path = path if path is not None else state.db_path
+    pattern = glob.escape(path) + "-matches-*.journal"
+    return sum(
+        _recover_journal(path, journal_path) for journal_path in glob.glob(pattern)
+    )
+
+
+def _recover_journal(path, journal_path):
+    try:
+        journal = open(journal_path, encoding="utf-8")
+    except FileNotFoundError:  # recovered by another process meanwhile
+        return 0
+
+    with journal:
+        # The lock is held by the journal's process until it exits, and by whoever
+        # is recovering it. Check the journal is still there too: another process
+        # may have recovered and removed it since we opened it.
+        if not _try_lock(journal) or not _same_file(journal, journal_path):
+            return 0
+        entries = [json.loads(line) for line in journal if line.strip()]
+
+        replayed = _replay(path, journal_path, entries)
+        os.remove(journal_path)
+
+    _forget(path, journal_path)
+    return replayed
+
+
+def _replay(path, journal_path, entries):
+    matches = []
+    elos = {}
+    with get_connection(path) as conn:
+        flushed = _last_batch(conn, journal_path)
+        for batch, user_id, winner_id, loser_id, winner_elo, loser_elo, ts in entries:
+            if batch <= flushed:
+                continue
+            matches.append((user_id, winner_id, loser_id, ts))
+            elos[winner_id] = winner_elo
+            elos[loser_id] = loser_elo
+
+        insert_comparisons(conn, matches)
+        _update_elos(conn, elos)
+        if matches:
+            _set_last_batch(conn, journal_path, entries[-1][0])
+    return len(matches)
+
+
+class WriteBehindQueue:
+    """In-memory buffer of match writes, backed by an append-only journal."""
+
+    def __init__(
+        self,
+        path,
+        batch_size=WRITE_BEHIND_BATCH_SIZE,
+        interval=WRITE_BEHIND_INTERVAL,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self._matches = []  # [(user_id, winner_id, loser_id, timestamp)]
+        self._elos = {}  # {book_id: latest elo}
+        self._journal_path = (
+            f"{path}-matches-{os.getpid()}-{uuid.uuid4().hex[:8]}.journal"
+        )
+        self._journal = _create_journal(self._journal_path)
+        self._batch = 1  # ID of the next flush
+        self._timer = None
+        self._lock = threading.RLock()
+        atexit.register(self.close)
+
+    def record_match(self, user_id, winner_id, loser_id, winner_elo, loser_elo):
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            entry = [
+                self._batch,
+                user_id,
+                winner_id,
+                loser_id,
+                winner_elo,
+                loser_elo,
+                timestamp,
+            ]
+            self._journal.write(json.dumps(entry) + "\n")
+            self._journal.flush()
+
+            self._matches.append((user_id, winner_id, loser_id, timestamp))
+            self._elos[winner_id] = winner_elo
+            self._elos[loser_id] = loser_elo
+
+            if len(self._matches) >= self.batch_size:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write every pending match and Elo score in one transaction."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if not self._matches:
+                return
+
+            with get_connection(self.path) as conn:
+                insert_comparisons(conn, self._matches)
+                _update_elos(conn, self._elos)
+                _set_last_batch(conn, self._journal_path, self._batch)
+
+            self._batch += 1
+            self._matches = []
+            self._elos = {}
+            self._journal.seek(0)
+            self._journal.truncate()
+
+    def close(self):
+        with self._lock:
+            if self._journal.closed:
+                return
+            self.flush()
+            self._journal.close()
+            os.remove(self._journal_path)
+            _forget(self.path, self._journal_path)
+        atexit.unregister(self.close)
+
+
+def _update_elos(conn, elos):
+    conn.executemany(
+        "UPDATE book SET elo = ? WHERE id = ?",
+        [(elo, book_id) for book_id, elo in elos.items()],
+    )
+
+
+def _last_batch(conn, journal_path):
+    """Return the ID of the last batch flushed from the journal, or 0 if none."""
+    row = conn.execute(
+        "SELECT last_batch FROM write_behind_state WHERE journal = ?",
+        (os.path.basename(journal_path),),
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def _set_last_batch(conn, journal_path, batch):
+    conn.execute(
+        "INSERT INTO write_behind_state (journal, last_batch) VALUES (?, ?)"
+        " ON CONFLICT (journal) DO UPDATE SET last_batch = excluded.last_batch",
+        (os.path.basename(journal_path), batch),
+    )
+
+
+def _forget(path, journal_path):
+    """Drop the flushed marker of a journal that's been removed."""
+    with get_connection(path) as conn:
+        conn.execute(
+            "DELETE FROM write_behind_state WHERE journal = ?",
+            (os.path.basename(journal_path),),
+        )
+
+
+def _create_journal(journal_path):
+    """Create and lock a new journal, so recover() never sees it unlocked."""
+    staging = journal_path + ".new"
+    journal = open(staging, "a", encoding="utf-8")
+    _try_lock(journal)
+    os.rename(staging, journal_path)
+    return journal
+
+
+def _try_lock(file):
+    """Lock file for as long as it's open, or return False if another holds it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _same_file(file, path):
+    try:
+        return os.path.samestat(os.fstat(file.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
@@ -18,7 +18,7 @@ from utils import format_book, header, press_enter, prompt
 PendingMatch = namedtuple("PendingMatch", ["match", "a", "b", "choice"])
 
 
-def run_game(books):
+def run_game(library):
     """Run the game's main loop.
 
     Select two books for comparison, prompt the user for choice between the two,
@@ -26,7 +26,7 @@ def run_game(books):
     """
     print(header("BRAWL PIT", new_line=True))
 
-    if len(books) <= 1:
+    if len(library) <= 1:
         print(
             f" {style('Not enough books in the pit.', ERROR)}"
             f" Add some more and try again."
@@ -34,16 +34,17 @@ def run_game(books):
         press_enter()
         return None
 
-    _print_instructions(len(books))
+    _print_instructions(len(library))
 
+    scoring = library.scoring
     match_count = 1
-    book_a, book_b = select_opponents(books)
+    book_a, book_b = select_opponents(scoring)
     previous = None
     opponents_selected = True
     while True:
         if not opponents_selected:
             match_count += 1
-            book_a, book_b = select_opponents(books)
+            book_a, book_b = select_opponents(scoring)
 
         _print_match(match_count, book_a, book_b)
         choice = prompt(options=PIT_OPTIONS)
@@ -58,7 +59,7 @@ def run_game(books):
             continue
 
         if previous:
-            resolve_comparison(previous.a, previous.b, previous.choice, books)
+            resolve_comparison(previous.a, previous.b, library, previous.choice)
 
         if choice in ["q", "b"]:
             return choice
@@ -2,12 +2,6 @@ from rich import box
 from rich.console import Console
 from rich.table import Table
 
-from services.ranking_service import rank_books
-from services.scoring_service import (
-    calculate_progress,
-    confidence_score,
-    score_breakdown,
-)
 from ui import (
     ACCENT,
     ACCURACY_EXPLAINER,
@@ -26,32 +20,29 @@ from ui import (
 from utils import header, library_summary, press_enter
 
 
-def view_leaderboard(books, verbose=False):
+def view_leaderboard(library, verbose=False):
     """Handle the leaderboard view.
 
     Provides current library status, ranks books based on Elo scores, and displays
-    rankings in batches.
+    rankings in batches. Only the books in each batch are ranked and scored.
     """
-    ranked_books = rank_books(books)
     batch_end = INITIAL_BATCH_SIZE
 
     print(header("THE LEADERBOARD", new_line=True))
 
     # Print informational summary of the user's library and current confidence level
-    print(library_summary(len(books), calculate_progress(books), PRIMARY))
+    print(library_summary(len(library), library.scoring.progress(), PRIMARY))
     press_enter("Press Enter to view leaderboard... ")
     print()
 
-    _print_table(ranked_books, 0, batch_end, books, verbose)
+    _print_table(library, 0, batch_end, verbose)
 
     while True:
-        next_action = _table_menu(batch_end, len(books))
+        next_action = _table_menu(batch_end, len(library))
 
         if next_action == "":
             batch_end += BATCH_SIZE
-            _print_table(
-                ranked_books, batch_end - BATCH_SIZE, batch_end, books, verbose
-            )
+            _print_table(library, batch_end - BATCH_SIZE, batch_end, verbose)
         elif next_action == "?":
             print(header("Accuracy Tiers", color=ACCENT))
             print(ACCURACY_EXPLAINER)
@@ -60,11 +51,11 @@ def view_leaderboard(books, verbose=False):
             return next_action
 
 
-def _print_table(ranked_books, start, end, books, verbose=False):
+def _print_table(library, start, end, verbose=False):
     table = Table(box=box.HORIZONTALS, border_style="bright_blue", width=LINE_WIDTH + 1)
 
     _add_columns(table, verbose)
-    _add_rows(table, ranked_books, start, end, books, verbose)
+    _add_rows(table, library.ranking.page(start, end), library.scoring, verbose)
 
     Console().print(table)
 
@@ -84,13 +75,12 @@ def _add_columns(table, verbose):
         table.add_column("WEI", justify="left", header_style=PRIMARY)
 
 
-def _add_rows(table, ranked_books, start, end, books, verbose):
-    for rank, b in ranked_books[start:end]:
+def _add_rows(table, ranked_books, scoring, verbose):
+    for rank, b in ranked_books:
         if verbose:
-            _verbose_row(table, b, rank, books)
+            _verbose_row(table, b, rank, scoring.breakdown(b))
         else:
-            con_score = confidence_score(b, books)
-            confidence = _confidence_label(con_score)
+            confidence = _confidence_label(scoring.confidence(b))
 
             table.add_row(str(rank), b.title, b.author, confidence)
 
@@ -99,9 +89,7 @@ def _confidence_label(confidence):
     return next(label for tier, label in ACCURACY_LABELS if confidence <= tier)
 
 
-def _verbose_row(table, b, rank, books):
-    score_detailed = score_breakdown(b, books)
-
+def _verbose_row(table, b, rank, score_detailed):
     table.add_row(
         str(rank),
         b.title,
@@ -2,8 +2,11 @@ import os
 
 from config import BOOK_LIMIT, DEFAULT_RATING
 from csv_handler import csv_reader, export_to_csv, import_from_csv
+from db import write_behind
 from db.books_repo import insert
-from models import Book
+from db.connection import close_connections
+from models import Book, rating_to_elo
+from services.library import book_key
 from ui import (
     CSV_INSTRUCTIONS,
     DIVIDER,
@@ -28,19 +31,19 @@ from utils import format_book, header, press_enter, prompt
 # ====== ADDING BOOKS
 
 
-def onboarding(books):
+def onboarding(library):
     """Handle the onboarding process of adding books for the first time."""
     print(ONBOARDING)
 
-    while not books:
+    while not library:
         print(ONBOARDING_MENU)
         choice = prompt(options=["1", "2", "q"])
 
         if choice == "q":
             return False
         elif choice == "1":
-            new_books = _manual_entry(books)
-            _process_import(new_books, books, method="manual")
+            new_books = _manual_entry(library)
+            _process_import(new_books, library, method="manual")
             print()
         elif choice == "2":
             print(CSV_INSTRUCTIONS)
@@ -54,19 +57,19 @@ def onboarding(books):
                 print("\n" + rule(LINE_WIDTH - 1, DIVIDER))
                 continue
 
-            new_books, interrupted = import_from_csv(filepath, books)
-            _process_import(new_books, books, interrupted)
+            new_books, interrupted = import_from_csv(filepath, library)
+            _process_import(new_books, library, interrupted)
 
             print()
 
     return True
 
 
-def add_books(books):
+def add_books(library):
     """Add new books to the library either through a CSV import or manual entry."""
     print(header("BOOK ENTRY", new_line=True))
 
-    if len(books) >= BOOK_LIMIT:
+    if len(library) >= BOOK_LIMIT:
         print(limit_reached(BOOK_LIMIT))
         press_enter()
         return
@@ -78,8 +81,8 @@ def add_books(books):
         if choice == "b":
             return
         elif choice == "1":
-            new_books = _manual_entry(books)
-            _process_import(new_books, books, method="manual")
+            new_books = _manual_entry(library)
+            _process_import(new_books, library, method="manual")
             break
         elif choice == "2":
             print(CSV_INSTRUCTIONS)
@@ -93,16 +96,16 @@ def add_books(books):
                 return
 
             print(f"\n {style('Processing file...', SECONDARY)}")
-            new_books, interrupted = import_from_csv(filepath, books)
+            new_books, interrupted = import_from_csv(filepath, library)
 
             print()
-            _process_import(new_books, books, interrupted, method="CSV")
+            _process_import(new_books, library, interrupted, method="CSV")
             break
 
 
-def _manual_entry(books):
+def _manual_entry(library):
     """Add new books to the library one at a time via user input."""
-    existing_books = {(b.title.lower(), b.author.lower()) for b in books}
+    new_keys = set()
     new_books = []
 
     print(MANUAL_INSTRUCTIONS)
@@ -126,7 +129,7 @@ def _manual_entry(books):
 
         author = input(style(" Author: ", SECONDARY)).strip()
 
-        if (title.lower(), author.lower()) in existing_books:
+        if book_key(title, author) in new_keys or library.find(title, author):
             print(style(" Book already in the system!", ERROR))
             continue
 
@@ -147,7 +150,7 @@ def _manual_entry(books):
             break
 
         rating = rating if raw_rating else DEFAULT_RATING
-        book = Book(title, author, rating)
+        book = Book(title, author, rating, rating_to_elo(rating, library.elo_bounds()))
 
         print(style("\n Adding:", SECONDARY), format_book(book, LINE_WIDTH - 9))
         if raw_rating:
@@ -157,22 +160,22 @@ def _manual_entry(books):
         confirm = prompt(p=f"{PROMPT}{style('Confirm (y/n)? ', SECONDARY)}")
 
         if confirm == "y":
-            insert(book)
+            insert(book, library.user_id)
             new_books.append(book)
-            existing_books.add((title.lower(), author.lower()))
+            new_keys.add(book_key(title, author))
 
-        if len(books) + len(new_books) >= BOOK_LIMIT:
+        if len(library) + len(new_books) >= BOOK_LIMIT:
             print(f"\ {rule(LINE_WIDTH - 1, DIVIDER)}")
             return new_books
 
 
-def _process_import(new_books, books, interrupted=False, method="CSV"):
+def _process_import(new_books, library, interrupted=False, method="CSV"):
     """Process import/new entries, display results and relevant messages."""
-    first_import = not books
+    first_import = not library
     added = len(new_books)
 
     if added > 0:
-        books.extend(new_books)
+        library.extend(new_books)
 
         verb = "Imported" if method == "CSV" else "Added"
         plural = "s" if added > 1 else ""
@@ -190,7 +193,7 @@ def _process_import(new_books, books, interrupted=False, method="CSV"):
 
         if interrupted:
             print(import_interrupted(added))
-        elif len(books) >= BOOK_LIMIT and not first_import:
+        elif len(library) >= BOOK_LIMIT and not first_import:
             print(LIMIT_WARNING)
 
         press_enter()
@@ -233,6 +236,8 @@ def reset_handler(books, db_path):
 
 
 def _reset(db_path):
+    write_behind.disable()
+    close_connections(db_path)
     try:
         os.remove(db_path)
     except OSError as e:
@@ -5,13 +5,14 @@ from datetime import datetime
 
 import state
 from csv_handler import export_to_csv
-from db.books_repo import get_all
-from db.connection import init_db
+from db import write_behind
+from db.connection import close_connections, init_db
 from game import run_game
 from leaderboard import (
     view_leaderboard,
 )
 from library_management import add_books, onboarding, reset_handler
+from services.library import Library
 from services.scoring_service import calculate_progress
 from ui import (
     ACCENT,
@@ -41,7 +42,7 @@ def startup():
 
     If no books are in the system, prompt the user to import from a CSV.
     """
-    state.books = get_all()
+    state.library = Library.load()
 
     os.system("cls" if os.name == "nt" else "clear")
     print("\033]1;Book Brawl\007", end="", flush=True)
@@ -53,12 +54,12 @@ def startup():
         print(TEST_MESSAGE)
 
     # First run, no books in the system - prompt for book entry
-    first_run = not state.books
+    first_run = not state.library
     if first_run:
-        if not onboarding(state.books):
-            quit_game(state.books, state.db_path)
+        if not onboarding(state.library):
+            quit_game(state.library, state.db_path)
 
-    state.progress = calculate_progress(state.books)
+    state.progress = calculate_progress(state.library)
     main_menu(first_run)
 
 
@@ -80,27 +81,27 @@ def main_menu(first_run=False):
         next_action = ""
 
         if choice == "1":
-            next_action = run_game(state.books)
-            state.progress = calculate_progress(state.books)
+            next_action = run_game(state.library)
+            state.progress = calculate_progress(state.library)
         elif choice in ("2", "2 -v"):
-            next_action = view_leaderboard(state.books, verbose="-v" in choice)
+            next_action = view_leaderboard(state.library, verbose="-v" in choice)
         elif choice == "3":
-            add_books(state.books)
-            state.progress = calculate_progress(state.books)
+            add_books(state.library)
+            state.progress = calculate_progress(state.library)
         elif choice == "4":
-            export_leaderboard(state.books)
+            export_leaderboard(state.library)
         elif choice == "5":
-            next_action = reset_handler(state.books, state.db_path)
+            next_action = reset_handler(state.library, state.db_path)
             if next_action == "q":
-                state.books = []
-                state.progress = calculate_progress(state.books)
+                state.library.reset()
+                state.progress = calculate_progress(state.library)
         elif choice in ["6", "q"]:
-            quit_game(state.books, state.db_path)
+            quit_game(state.library, state.db_path)
 
         if next_action == "q":
-            quit_game(state.books, state.db_path)
+            quit_game(state.library, state.db_path)
         if next_action == "e":
-            export_leaderboard(state.books)
+            export_leaderboard(state.library)
 
         first_run = False
         print()
@@ -130,6 +131,7 @@ def export_leaderboard(books):
 
 def quit_game(books, db_path):
     """Quit the program and perform any necessary backups."""
+    write_behind.disable()  # Flush any batched matches before the backup
     if books:
         backup_db(db_path)
         backup_cleanup(BACKUPS_LIMIT, db_path)
@@ -146,6 +148,7 @@ def backup_db(db_path):
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     backup_path = os.path.join(backup_dir, f"backup_{current_db}_{timestamp}.db")
 
+    close_connections(db_path)  # Checkpoint the WAL so the copy has every write
     shutil.copy(db_path, backup_path)
 
 
@@ -172,4 +175,6 @@ if __name__ == "__main__":
         state.db_path = "data/test.db"
 
     init_db(state.db_path)
+    write_behind.recover(state.db_path)
+    write_behind.enable(state.db_path)
     startup()
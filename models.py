@@ -1,10 +1,27 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+import numpy as np
+
 from config import DEFAULT_RATING
-from db import books_repo
+
+ELO_MIN = 800  # Initial Elo range, which a library's Elo bounds only ever widen
+ELO_MAX = 1200
 
 
 class Book:
-    elo_min = 800
-    elo_max = 1200
+    __slots__ = (
+        "id",
+        "title",
+        "author",
+        "rating",
+        "elo",
+        "elo_index",
+        "history",
+        "index",
+    )
 
     def __init__(self, title, author, rating, elo=None, book_id=None):
         self.id = book_id
@@ -12,37 +29,285 @@ class Book:
         self.author = author
         self.rating = rating
         self.elo = elo if elo is not None else rating_to_elo(rating)
-        self.opponents = {}  # {opp_id: times_matched} - used for confidence scoring
-        self.won_over = {}  # {opp_id: times_won_over} - used for tiebreaking
+        self.elo_index = None  # EloIndex holding this book, kept in sync on updates
+        self.history = None  # MatchHistory holding this book's opponents and wins
+        self.index = None  # Dense position of this book in its MatchHistory
+
+    @property
+    def opponents(self):
+        """{opp_id: times_matched} - used for confidence scoring"""
+        return self._history().opponents(self.index)
+
+    @property
+    def won_over(self):
+        """{opp_id: times_won_over} - used for tiebreaking"""
+        return self._history().won_over(self.index)
 
     def update_elo(self, new_elo):
-        """Update the Elo score for this book and update the global min/max."""
+        """Update the Elo score for this book and its Elo index (and so its bounds).
+
+        Only updates the in-memory state; persisting it is up to the caller.
+        """
+        old_elo = self.elo
         self.elo = new_elo
-        books_repo.update_elo(self)
 
-        if self.elo < Book.elo_min:
-            Book.elo_min = self.elo
-        if self.elo > Book.elo_max:
-            Book.elo_max = self.elo
+        if self.elo_index is not None:
+            self.elo_index.move(self, old_elo)
 
-    def record_opponent(self, opponent_id):
-        self.opponents[opponent_id] = self.opponents.get(opponent_id, 0) + 1
+    def record_opponent(self, opponent_id, times=1):
+        self._history().record(self.index, opponent_id, matches=times)
 
-    def record_won_over(self, opponent_id):
-        self.won_over[opponent_id] = self.won_over.get(opponent_id, 0) + 1
+    def record_won_over(self, opponent_id, times=1):
+        self._history().record(self.index, opponent_id, wins=times)
+
+    def _history(self):
+        if self.history is None:
+            MatchHistory((self,))
+        return self.history
 
     def __repr__(self):
         return f"{self.title}, by {self.author}"
 
 
-def rating_to_elo(rating):
+class MatchHistory:
+    """Opponent and win counts for a set of books, in one shared sparse store.
+
+    Each book gets a dense integer index. Per book, opponents are kept as a sorted
+    array of opponent indices, with parallel arrays of match and win counts, which is
+    far more compact than a pair of dicts per book. Book.opponents and Book.won_over
+    expose them as read-only mappings keyed by opponent ID.
+    """
+
+    def __init__(self, books=()):
+        self.ids = []  # [book_id], by index
+        self._positions = {}  # {book_id: index}
+        self._opponents = []  # [array of opponent indices, sorted], by index
+        self._matches = []  # [array of match counts], aligned with _opponents
+        self._wins = []  # [array of win counts], aligned with _opponents
+        for book in books:
+            self.add(book)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, book):
+        """Give a book an index in this history, moving over any counts it has."""
+        if book.history is self:
+            return
+
+        previous, old_index = book.history, book.index
+        book.index = self._position(book.id)
+        book.history = self
+
+        if previous is not None:
+            counts = zip(
+                previous._opponents[old_index],
+                previous._matches[old_index],
+                previous._wins[old_index],
+            )
+            for j, matches, wins in counts:
+                opponent_index = self._position(previous.ids[j])
+                self._increment(book.index, opponent_index, matches, wins)
+
+    def load(self, pairs):
+        """Add (winner_id, loser_id, count) rows, counting each pair for both books.
+
+        Into an empty history, e.g., while loading a library, the rows are added in a
+        few vectorized passes. Otherwise they're added one at a time.
+        """
+        if any(self._opponents):
+            for winner_id, loser_id, count in pairs:
+                self.record(self._position(winner_id), loser_id, count, count)
+                self.record(self._position(loser_id), winner_id, count, 0)
+            return
+
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 3)
+        if not len(pairs):
+            return
+
+        winners, losers = self._indices(pairs[:, 0]), self._indices(pairs[:, 1])
+        counts = pairs[:, 2]
+
+        # One entry per (book, opponent), from the winner's and the loser's side
+        n = len(self.ids)
+        keys, inverse = np.unique(
+            np.concatenate([winners * n + losers, losers * n + winners]),
+            return_inverse=True,
+        )
+        matches = np.bincount(inverse, np.concatenate([counts, counts]))
+        wins = np.bincount(inverse, np.concatenate([counts, np.zeros_like(counts)]))
+        books, opponents = np.divmod(keys, n)
+
+        bounds = np.searchsorted(books, np.arange(n + 1))
+        for i in np.flatnonzero(np.diff(bounds)):
+            start, end = bounds[i], bounds[i + 1]
+            self._opponents[i] = _int_array(opponents[start:end])
+            self._matches[i] = _int_array(matches[start:end])
+            self._wins[i] = _int_array(wins[start:end])
+
+    def opponents(self, i):
+        return MatchCounts(self, i, self._matches)
+
+    def won_over(self, i):
+        return MatchCounts(self, i, self._wins)
+
+    def record(self, i, opponent_id, matches=0, wins=0):
+        """Add to the match and win counts of book i against the given opponent."""
+        self._increment(i, self._position(opponent_id), matches, wins)
+
+    def _increment(self, i, j, matches, wins):
+        opponents = self._opponents[i]
+        k = bisect_left(opponents, j)
+        if k == len(opponents) or opponents[k] != j:
+            opponents.insert(k, j)
+            self._matches[i].insert(k, 0)
+            self._wins[i].insert(k, 0)
+        self._matches[i][k] += matches
+        self._wins[i][k] += wins
+
+    def _find(self, i, opponent_id):
+        """Return where the given opponent is in book i's arrays, or -1."""
+        j = self._positions.get(opponent_id)
+        if j is None:
+            return -1
+        opponents = self._opponents[i]
+        k = bisect_left(opponents, j)
+        return k if k < len(opponents) and opponents[k] == j else -1
+
+    def _indices(self, book_ids):
+        """Return the indices of an array of book IDs, reserving new ones if needed."""
+        for book_id in set(book_ids.tolist()) - self._positions.keys():
+            self._position(book_id)
+
+        known_ids = np.fromiter(self._positions.keys(), dtype=np.int64)
+        known_indices = np.fromiter(self._positions.values(), dtype=np.int64)
+        order = np.argsort(known_ids)
+        return known_indices[order][np.searchsorted(known_ids[order], book_ids)]
+
+    def _position(self, book_id):
+        """Return the index of a book ID, reserving a new one if needed.
+
+        Unsaved books (i.e., without an ID) always get a new index.
+        """
+        i = self._positions.get(book_id)
+        if i is None:
+            i = len(self.ids)
+            if book_id is not None:
+                self._positions[book_id] = i
+            self.ids.append(book_id)
+            self._opponents.append(array("i"))
+            self._matches.append(array("i"))
+            self._wins.append(array("i"))
+        return i
+
+
+def _int_array(values):
+    return array("i", values.astype(np.intc).tobytes())
+
+
+class MatchCounts(Mapping):
+    """Read-only view of one book's match or win counts, keyed by opponent ID.
+
+    Opponents with a count of zero (e.g., faced but never beaten) are left out.
+    """
+
+    __slots__ = ("_history", "_i", "_counts")
+
+    def __init__(self, history, i, counts):
+        self._history = history
+        self._i = i
+        self._counts = counts[i]
+
+    def __getitem__(self, opponent_id):
+        k = self._history._find(self._i, opponent_id)
+        if k < 0 or not self._counts[k]:
+            raise KeyError(opponent_id)
+        return self._counts[k]
+
+    def __contains__(self, opponent_id):
+        k = self._history._find(self._i, opponent_id)
+        return k >= 0 and self._counts[k] > 0
+
+    def get(self, opponent_id, default=None):
+        k = self._history._find(self._i, opponent_id)
+        return self._counts[k] if k >= 0 and self._counts[k] else default
+
+    def __iter__(self):
+        ids = self._history.ids
+        opponents = self._history._opponents[self._i]
+        return (ids[j] for j, count in zip(opponents, self._counts) if count)
+
+    def __len__(self):
+        return len(self._counts) - self._counts.count(0)
+
+
+class EloIndex:
+    """Books kept in Elo order to answer Elo window queries in O(log n + k).
+
+    Books are stored as a sorted list of (elo, id) keys searched with bisect. Adding a
+    book to the index links it back via `book.elo_index`, so Book.update_elo can keep
+    its position current. The ends of the list give the library's Elo bounds, which
+    follow the extremes both ways as they move.
+    """
+
+    def __init__(self, books=()):
+        ordered = sorted(books, key=lambda b: (b.elo, b.id))
+        self._keys = [(b.elo, b.id) for b in ordered]
+        self._books = ordered
+        for book in ordered:
+            book.elo_index = self
+
+    def __len__(self):
+        return len(self._books)
+
+    def add(self, book):
+        key = (book.elo, book.id)
+        i = bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._books.insert(i, book)
+        book.elo_index = self
+
+    def move(self, book, old_elo):
+        """Reposition a book after its Elo changed from old_elo."""
+        i = bisect_left(self._keys, (old_elo, book.id))
+        del self._keys[i]
+        del self._books[i]
+
+        key = (book.elo, book.id)
+        i = bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._books.insert(i, book)
+
+    def bounds(self):
+        """Return the (min, max) Elo bounds: 800-1200, widened to fit every book."""
+        if not self._keys:
+            return ELO_MIN, ELO_MAX
+        return min(ELO_MIN, self._keys[0][0]), max(ELO_MAX, self._keys[-1][0])
+
+    def within(self, elo, distance):
+        """Return the books with an Elo in [elo - distance, elo + distance]."""
+        start, end = self._bounds(elo, distance)
+        return self._books[start:end]
+
+    def count_within(self, elo, distance):
+        """Return how many books have an Elo in [elo - distance, elo + distance]."""
+        start, end = self._bounds(elo, distance)
+        return end - start
+
+    def _bounds(self, elo, distance):
+        start = bisect_left(self._keys, (elo - distance,))
+        end = bisect_right(self._keys, (elo + distance, math.inf))
+        return start, end
+
+
+def rating_to_elo(rating, bounds=(ELO_MIN, ELO_MAX)):
     """Maps a rating (1-10) to an initial Elo score.
 
     If scores are still within the initial 800-1200 range, use that default mapping.
-    Otherwise, adjust the lower and upper bounds to match the current bounds.
+    Otherwise, pass the library's current Elo bounds (see EloIndex.bounds()) to map
+    onto those instead.
     """
     if rating is None:
         rating = DEFAULT_RATING
-    elo_min = Book.elo_min if Book.elo_min < 800 else 800
-    elo_max = Book.elo_max if Book.elo_max > 1200 else 1200
+    elo_min, elo_max = bounds
     return round(elo_min + (rating - 1) * ((elo_max - elo_min) / 9))
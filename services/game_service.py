@@ -1,41 +1,69 @@
 import random
 
-from db.comparisons_repo import insert as insert_comparison
-from services.scoring_service import calculate_elo, opponent_weights, sampling_weight
+from db.comparisons_repo import record_match
 
+MAX_OPPONENT_DRAWS = 50
 
-def select_opponents(books):
+
+def select_opponents(scoring):
     """Select two books using weighted random selection.
 
     Favor low-confidence books (i.e., books with fewer unique matches played), books
     that have been matched against each other less often, and books with similar Elo
     scores, to maximize information gained from each match.
     """
-    # Calculate weights based on confidence level.
-    weights = [sampling_weight(book, books) for book in books]
+    scoring.sync()
+    books = scoring.books
+
+    # Draw book_a based on confidence level.
+    book_a = books[scoring.selection.sample()]
+
+    # Draw book_b based on its weight relative to the selected book_a
+    book_b = _draw_opponent(book_a, scoring)
+
+    return book_a, book_b
+
+
+def _draw_opponent(book_a, scoring):
+    """Draw an opponent for book_a with probability proportional to its opponent weight.
+
+    Candidates are proposed from the base weights, which bound each opponent weight
+    from above, and accepted with probability opponent weight / base weight. This
+    yields exactly the opponent_weights() distribution in O(log n) per draw. If every
+    draw is rejected, fall back to a full pass over the library.
+    """
+    books = scoring.books
+    for _ in range(MAX_OPPONENT_DRAWS):
+        i = scoring.opponent_pool.sample()
+        candidate = books[i]
+        if candidate.id == book_a.id:
+            continue
 
-    book_a = random.choices(books, weights=weights, k=1)[0]
+        base_weight = scoring.opponent_pool.weight(i)
+        if random.random() * base_weight < scoring.opponent_weight(book_a, candidate):
+            return candidate
 
-    # Calculate weights for book_b candidates based on the selected book_a
-    candidates = opponent_weights(book_a, books)
+    candidates = scoring.opponent_weights(book_a)
     candidate_books = [b for b, w in candidates]
     candidate_weights = [w for b, w in candidates]
 
-    book_b = random.choices(candidate_books, weights=candidate_weights, k=1)[0]
-
-    return book_a, book_b
+    return random.choices(candidate_books, weights=candidate_weights, k=1)[0]
 
 
-def resolve_comparison(book_a, book_b, books, selection=1):
+def resolve_comparison(book_a, book_b, library, selection="1"):
     """Update book records after a match is resolved.
 
-    Update Elo scores, persist match, and update book opponents and wins.
+    Persist the match and both new Elo scores in one transaction, then update the
+    books in memory (Elo scores, opponents, and wins) and refresh the cached scores
+    and ranking the match affected.
     """
+    scoring = library.scoring
     winner = book_a if selection == "1" else book_b
     loser = book_b if selection == "1" else book_a
+    old_elos = (winner.elo, loser.elo)
 
-    new_winner_elo, new_loser_elo = calculate_elo(winner, loser, books)
-    insert_comparison(winner.id, loser.id)
+    new_winner_elo, new_loser_elo = scoring.calculate_elo(winner, loser)
+    record_match(winner.id, loser.id, new_winner_elo, new_loser_elo, library.user_id)
 
     winner.update_elo(new_winner_elo)
     loser.update_elo(new_loser_elo)
@@ -44,3 +72,19 @@ def resolve_comparison(book_a, book_b, books, selection=1):
     loser.record_opponent(winner.id)
 
     winner.record_won_over(loser.id)
+
+    scoring.refresh((winner, loser), old_elos)
+    library.ranking.update((winner, loser), old_elos)
+    library.changed()
+
+
+def resolve_match(library, winner, loser):
+    """Resolve a match in a library served by the API. Runs on its actor.
+
+    Besides resolving it, count it in with the library's sync, drop any pair drawn
+    ahead between the same books, and catch up with other processes' changes.
+    """
+    resolve_comparison(winner, loser, library)
+    library.sync.expect(winner, loser)
+    library.matches.discard((winner, loser))
+    library.sync.pull(library)
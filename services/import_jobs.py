@@ -0,0 +1,114 @@
+import csv
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import IMPORT_JOB_TTL, IMPORT_WORKERS
+from services.library_service import ImportResult, import_books
+
+
+class ImportJob:
+    """A CSV import running in the background, with its progress so far."""
+
+    def __init__(self, user_id):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.status = "queued"  # queued, running, done, or failed
+        self.result = ImportResult(new_books=[], skipped=0, interrupted=False)
+        self.error = None
+        self.finished_at = None
+
+    def progress(self):
+        """Return the job's status and counts so far."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "processed": self.result.processed,
+            "imported": len(self.result.new_books),
+            "skipped": self.result.skipped,
+            "errored": len(self.result.errors),
+            "interrupted": self.result.interrupted,
+            "error": self.error,
+        }
+
+
+class ImportJobs:
+    """Run CSV imports on a worker pool and keep their progress for polling.
+
+    Imports into the same user's library run one at a time, and each chunk is checked
+    and inserted on the library's actor, so duplicate checks and the BOOK_LIMIT
+    cutoff see every book added before it. Finished jobs are forgotten ttl seconds
+    after they end.
+    """
+
+    def __init__(self, workers=IMPORT_WORKERS, ttl=IMPORT_JOB_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="import")
+        self._jobs = {}  # {job_id: ImportJob}
+        # {user_id: [Lock, jobs queued or running]}, the lock held while one runs. An
+        # entry is removed once the user's last job ends.
+        self._user_locks = {}
+        self._lock = threading.Lock()
+
+    def submit(self, path, library):
+        """Queue an import of the CSV file at path, deleting the file once done.
+
+        Imported books are added to the library as they're inserted. Return the new
+        ImportJob.
+        """
+        job = ImportJob(library.user_id)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+            entry = self._user_locks.setdefault(job.user_id, [threading.Lock(), 0])
+            entry[1] += 1
+            user_lock = entry[0]
+
+        self._executor.submit(self._run, job, path, library, user_lock)
+        return job
+
+    def get(self, job_id):
+        """Return the job with the given ID, or None if unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        """Wait for running and queued imports to finish."""
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job, path, library, user_lock):
+        try:
+            with user_lock:
+                job.status = "running"
+                with open(path, newline="", encoding="utf-8") as file:
+                    reader = csv.DictReader(file)
+                    reader.fieldnames = [f.lower().strip() for f in reader.fieldnames]
+                    job.result = import_books(
+                        reader,
+                        library,
+                        on_progress=lambda r: setattr(job, "result", r),
+                        actor=library.actor,
+                    )
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.monotonic()
+            os.remove(path)
+            self._release(job.user_id)
+
+    def _release(self, user_id):
+        with self._lock:
+            entry = self._user_locks[user_id]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[user_id]
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
@@ -0,0 +1,253 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config import LIBRARY_CACHE_MAX_BOOKS, LIBRARY_IDLE_TTL
+from db import books_repo
+from models import MatchHistory
+from services.library_actor import LibraryActor
+from services.library_sync import LibrarySync
+from services.match_queue import MatchQueue
+from services.ranking_service import RankingIndex
+from services.scoring_service import ScoringEngine, elo_bounds
+
+
+class Library:
+    """A user's books, indexed by ID and by title and author.
+
+    Behaves like a read-only sequence of books. Go through add(), extend(), and
+    reset() to change it, so the indexes stay in sync with the books. Every book's
+    opponents and wins live in one MatchHistory, which the library takes over from its
+    initial books when they already share one. The scoring engine and ranking index are
+    built on first use.
+
+    `version` is bumped on every change (new books, matches), so readers can tell
+    whether anything they computed from the library is still current. In the API,
+    changes go through `actor`, which holds `lock` while applying them, and `sync`
+    keeps the library in step with what other processes write.
+    """
+
+    def __init__(self, books=(), user_id=None, watermark=None):
+        books = list(books)
+        self.user_id = user_id
+        self.watermark = watermark  # (comparison ID, book ID) seen, see changes_repo
+        self.books = []
+        self.history = _shared_history(books) or MatchHistory()
+        self.last_used = time.monotonic()
+        self.version = 0
+        self.lock = threading.Lock()
+        self._epoch = uuid.uuid4().hex  # tells versions of reloaded libraries apart
+        self._by_id = {}  # {book_id: Book}
+        self._by_key = {}  # {(title, author) normalized: Book}
+        self._scoring = None
+        self._ranking = None
+        self._matches = None
+        self._actor = None
+        self._sync = None
+        self.extend(books)
+        self.synced_version = self.version  # last version matching the watermark
+
+    @classmethod
+    def load(cls, user_id=None):
+        """Load a user's library from the database."""
+        books, watermark = books_repo.load(user_id)
+        return cls(books, user_id, watermark)
+
+    @property
+    def scoring(self):
+        """The ScoringEngine over this library's books."""
+        if self._scoring is None:
+            self._scoring = ScoringEngine(self.books)
+        return self._scoring
+
+    @property
+    def ranking(self):
+        """The RankingIndex over this library's books."""
+        if self._ranking is None:
+            self._ranking = RankingIndex(self.books)
+        return self._ranking
+
+    @property
+    def matches(self):
+        """The MatchQueue of opponent pairs drawn ahead for this library."""
+        if self._matches is None:
+            self._matches = MatchQueue(self)
+        return self._matches
+
+    @property
+    def actor(self):
+        """The LibraryActor that applies the API's changes to this library."""
+        if self._actor is None:
+            self._actor = LibraryActor(self)
+        return self._actor
+
+    @property
+    def sync(self):
+        """The LibrarySync that applies other processes' changes to this library."""
+        if self._sync is None:
+            self._sync = LibrarySync(self)
+        return self._sync
+
+    @property
+    def etag(self):
+        """An opaque tag that changes whenever the library does, even across reloads.
+
+        While the library holds exactly what the database held at its watermark, the
+        tag is the watermark, so it's shared by every process and reload serving the
+        same data. Otherwise (e.g., matches not yet written back), it's only valid in
+        this process.
+        """
+        if self.watermark is not None and self.synced_version == self.version:
+            return "{}-{}".format(*self.watermark)
+        return f"{self._epoch}-{self.version}"
+
+    def changed(self):
+        """Bump the library's version, e.g., after a match changed its books."""
+        self.version += 1
+
+    def __len__(self):
+        return len(self.books)
+
+    def __iter__(self):
+        return iter(self.books)
+
+    def __getitem__(self, i):
+        return self.books[i]
+
+    def get(self, book_id):
+        """Return the book with the given ID, or None if not in the library."""
+        return self._by_id.get(book_id)
+
+    def find(self, title, author):
+        """Return the book with the given title and author (ignoring case), or None."""
+        return self._by_key.get(book_key(title, author))
+
+    def elo_bounds(self):
+        """Return the library's (min, max) Elo bounds, to seed new books' Elo from."""
+        return elo_bounds(self.books)
+
+    def add(self, book):
+        """Add a saved book (i.e., one with an ID) to the library."""
+        self.history.add(book)
+        self.books.append(book)
+        self._by_id[book.id] = book
+        self._by_key[book_key(book.title, book.author)] = book
+        self.changed()
+
+    def extend(self, books):
+        for book in books:
+            self.add(book)
+
+    def reset(self):
+        """Remove every book from the library."""
+        self.books = []
+        self.history = MatchHistory()
+        self._by_id = {}
+        self._by_key = {}
+        self._scoring = None
+        self._ranking = None
+        self._matches = None
+        self.changed()
+
+
+def _shared_history(books):
+    """Return the MatchHistory every book belongs to, if they all share one."""
+    histories = {id(book.history): book.history for book in books}
+    if len(histories) == 1:
+        return next(iter(histories.values()))
+    return None
+
+
+def book_key(title, author):
+    """Return the normalized (title, author) used to detect duplicate books."""
+    return title.strip().lower(), author.strip().lower()
+
+
+class LibraryCache:
+    """Per-user libraries, loaded lazily on first use and evicted when idle.
+
+    Libraries unused for idle_ttl seconds are dropped first, then the least recently
+    used ones, until the resident libraries hold at most max_books books in total.
+    The library being requested is never evicted, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, max_books=LIBRARY_CACHE_MAX_BOOKS, idle_ttl=LIBRARY_IDLE_TTL):
+        self.max_books = max_books
+        self.idle_ttl = idle_ttl
+        self._libraries = OrderedDict()  # {user_id: Library}, least recently used first
+        self._lock = threading.Lock()
+        self._loading = {}  # {user_id: Lock}, held while that library is loaded
+
+    def __contains__(self, user_id):
+        return user_id in self._libraries
+
+    def __len__(self):
+        return len(self._libraries)
+
+    def get(self, user_id, load=True):
+        """Return the user's library, loading it from the database if not cached.
+
+        With load=False, return None instead of loading it.
+        """
+        library = self._touch(user_id)
+        if library is not None or not load:
+            return library
+
+        # Load outside the cache lock so other users aren't blocked, but only once
+        # per user if concurrent requests miss at the same time.
+        with self._lock:
+            loading = self._loading.setdefault(user_id, threading.Lock())
+        with loading:
+            library = self._touch(user_id)
+            if library is None:
+                library = Library.load(user_id)
+                with self._lock:
+                    self._libraries[user_id] = library
+                    self._evict(keep=user_id)
+            with self._lock:
+                self._loading.pop(user_id, None)
+
+        return library
+
+    def peek(self, user_id):
+        """Return the user's library if it's cached, without loading it."""
+        with self._lock:
+            return self._libraries.get(user_id)
+
+    def evict(self, user_id):
+        """Drop a user's library, e.g., after changes made outside of it."""
+        with self._lock:
+            self._libraries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._libraries.clear()
+
+    def resident_books(self):
+        """Return the number of books held by all cached libraries."""
+        with self._lock:
+            return sum(len(library) for library in self._libraries.values())
+
+    def _touch(self, user_id):
+        """Return a cached library and mark it as most recently used."""
+        with self._lock:
+            library = self._libraries.get(user_id)
+            if library is not None:
+                library.last_used = time.monotonic()
+                self._libraries.move_to_end(user_id)
+            return library
+
+    def _evict(self, keep):
+        """Drop idle libraries, then least recently used ones while over budget."""
+        cutoff = time.monotonic() - self.idle_ttl
+        for user_id, library in list(self._libraries.items()):
+            if user_id != keep and library.last_used < cutoff:
+                del self._libraries[user_id]
+
+        total = sum(len(library) for library in self._libraries.values())
+        for user_id in list(self._libraries):
+            if total <= self.max_books:
+                break
+            if user_id != keep:
+                total -= len(self._libraries.pop(user_id))
@@ -0,0 +1,129 @@
+"""Serialized changes and snapshot reads for the API's shared libraries.
+
+Every change to a library (matches, new books, imported books) is sent to its
+LibraryActor, which applies them one at a time, in the order they were sent. Readers
+never touch the live books while a change may be halfway through: they read the
+latest LibrarySnapshot, which holds what the read endpoints serve as of one version.
+Anything more than a snapshot's summary (e.g., a leaderboard page) is computed on the
+actor when first read, and kept on the snapshot for later reads.
+
+Actors don't have a thread each. A library's pending changes are drained in batches
+on a shared pool of LIBRARY_ACTOR_THREADS threads, never on two threads at once.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import LIBRARY_ACTOR_THREADS, LIBRARY_SNAPSHOT_READS
+
+_pool = None
+_MISSING = object()
+
+
+def start(threads=LIBRARY_ACTOR_THREADS):
+    """Start the thread pool actors run on."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(threads, thread_name_prefix="library")
+
+
+def stop():
+    """Wait for pending changes to be applied, then stop the pool."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+class LibraryActor:
+    """Apply changes to a library in order, and publish snapshots of it for reads.
+
+    Changes are functions called with the library as first argument. Each batch is
+    applied holding library.lock, so background work like refilling the match queue
+    never sees a change halfway through.
+    """
+
+    def __init__(self, library):
+        self.library = library
+        self._mailbox = deque()  # [(fn, args, Future)]
+        self._lock = threading.Lock()
+        self._draining = False
+        self._snapshot = None
+
+    def submit(self, fn, *args):
+        """Queue fn(library, *args) and return a Future of its result."""
+        future = Future()
+        with self._lock:
+            self._mailbox.append((fn, args, future))
+            if not self._draining:
+                self._draining = True
+                _pool.submit(self._drain)
+        return future
+
+    async def call(self, fn, *args):
+        """Apply fn(library, *args) in turn and return its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    async def read(self, fn, *args):
+        """Return (snapshot, fn(library, *args)) as of the library's latest change.
+
+        Snapshots are only built when read, on the actor, once per version of the
+        library. fn is called on the actor too, at most once per version and
+        arguments: repeated reads between changes get the result kept on the snapshot.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.library.version:
+            result = snapshot.reads.get((fn, args), _MISSING)
+            if result is not _MISSING:
+                return snapshot, result
+        return await self.call(self._read, fn, args)
+
+    def _read(self, library, fn, args):
+        snapshot = self._publish(library)
+        key = (fn, args)
+        if key not in snapshot.reads:
+            if len(snapshot.reads) >= LIBRARY_SNAPSHOT_READS:
+                snapshot.reads.clear()
+            snapshot.reads[key] = fn(library, *args)
+        return snapshot, snapshot.reads[key]
+
+    def _publish(self, library):
+        if self._snapshot is None or self._snapshot.version != library.version:
+            self._snapshot = LibrarySnapshot(library)
+        return self._snapshot
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                if not self._mailbox:
+                    self._draining = False
+                    return
+                batch = list(self._mailbox)
+                self._mailbox.clear()
+
+            with self.library.lock:
+                for fn, args, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        future.set_result(fn(self.library, *args))
+                    except BaseException as e:
+                        future.set_exception(e)
+
+
+class LibrarySnapshot:
+    """What the read endpoints serve about a library, as of one version.
+
+    Nothing beyond the version and book count is computed up front. `reads` keeps the
+    results of LibraryActor.read() at this version, so e.g. a leaderboard page is
+    built once, from the ranking index, rather than the whole leaderboard on every
+    change.
+    """
+
+    def __init__(self, library):
+        self.version = library.version
+        self.etag = library.etag
+        self.book_count = len(library)
+        self.reads = {}  # {(fn, args): result}
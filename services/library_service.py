@@ -1,8 +1,9 @@
 from dataclasses import dataclass, field
 
-from config import BOOK_LIMIT, DEFAULT_RATING
-from db.books_repo import insert
-from models import Book
+from config import BOOK_LIMIT, DEFAULT_RATING, IMPORT_CHUNK_SIZE, LEADERBOARD_PAGE_SIZE
+from db.books_repo import insert, insert_many
+from models import Book, rating_to_elo
+from services.library import book_key
 
 
 @dataclass
@@ -11,29 +12,163 @@ class ImportResult:
     skipped: int
     interrupted: bool
     errors: list[str] = field(default_factory=list)
+    processed: int = 0  # CSV rows read so far
 
 
-def import_books(reader, books):
+def add_book(library, book):
+    """Save a book and add it to the library, unless it's already there.
+
+    Runs on the library's actor. Return whether the book was added.
+    """
+    if library.find(book.title, book.author):
+        return False
+
+    book.elo = rating_to_elo(book.rating, library.elo_bounds())
+    insert(book, library.user_id)
+    library.add(book)
+    library.sync.pull(library)
+    return True
+
+
+def leaderboard_page(library, offset, limit, around):
+    """Return the rows of a leaderboard page, or None if around isn't a book ID.
+
+    Pages start at offset, with limit books (all of them if None). If around is a
+    book ID, the page is centered on that book instead, with LEADERBOARD_PAGE_SIZE
+    books unless a limit is given. Only the books on the page are ranked and scored.
+    """
+    ranking = library.ranking
+    if around is not None:
+        book = library.get(around)
+        if book is None:
+            return None
+        limit = limit or LEADERBOARD_PAGE_SIZE
+        offset = max(0, ranking.position(book) - limit // 2)
+
+    stop = len(ranking) if limit is None else offset + limit
+    return [
+        {
+            "id": book.id,
+            "rank": rank,
+            "title": book.title,
+            "author": book.author,
+            "accuracy": round(library.scoring.confidence(book), 4),
+        }
+        for rank, book in ranking.page(offset, stop)
+    ]
+
+
+def progress(library):
+    """Return the library's overall progress, i.e., its mean confidence score."""
+    return library.scoring.progress()
+
+
+def import_books(
+    reader, library, chunk_size=IMPORT_CHUNK_SIZE, on_progress=None, actor=None
+):
     """Process each row of the CSV, adding new books to the database.
 
-    Validates each row, skipping duplicate and invalid entries.
+    Validates each row, skipping duplicate and invalid entries. Rows are read as they
+    stream in, and valid books are inserted in chunks of chunk_size, one transaction
+    per chunk. New books are returned in the result for the caller to add to the
+    library.
+
+    If given the library's actor (i.e., in the API), each chunk is checked and
+    inserted on it instead, in order with the library's other changes, and added to
+    the library right away.
+
+    If given, on_progress is called with the result so far after each chunk.
     """
-    existing_books = {(b.title.lower(), b.author.lower()) for b in books}
+    new_keys = set()
+    pending = []
+    in_library = 0  # imported books already in the library, e.g., pulled by its sync
 
     result = ImportResult(new_books=[], skipped=0, interrupted=False)
 
-    for i, row in enumerate(reader, start=2):
-        if len(books) + len(result.new_books) >= BOOK_LIMIT:
-            result.interrupted = True
-            return result
-
-        _process_row(row, i, existing_books, result)
+    i = 1
+    try:
+        for i, row in enumerate(reader, start=2):
+            in_library = _count_in_library(library, result.new_books, in_library)
+            imported = len(result.new_books) - in_library + len(pending)
+            if result.interrupted or len(library) + imported >= BOOK_LIMIT:
+                result.interrupted = True
+                break
+
+            _process_row(row, i, library, new_keys, pending, result)
+            result.processed += 1
+
+            if result.processed % chunk_size == 0:
+                _apply_chunk(library, pending, result, actor)
+                if on_progress:
+                    on_progress(result)
+    except UnicodeDecodeError:
+        result.errors.append(f"Stopped at row {i + 1}: file is not valid UTF-8")
+
+    _apply_chunk(library, pending, result, actor)
+    if on_progress:
+        on_progress(result)
 
     return result
 
 
-def _process_row(row, i, existing_books, result):
-    """Validate and process a single CSV row, updating the import result in place."""
+def _count_in_library(library, new_books, counted):
+    """Return how many imported books the library holds, counting on from counted.
+
+    Books past the library's watermark are added to it in ID order, so the ones it
+    holds are always the first few imported, and each is only looked up once.
+    """
+    while counted < len(new_books) and library.get(new_books[counted].id):
+        counted += 1
+    return counted
+
+
+def _apply_chunk(library, pending, result, actor):
+    if actor is None:
+        _insert_chunk(library, pending, result)
+    else:
+        actor.submit(_add_chunk, pending, result).result()
+
+
+def _insert_chunk(library, pending, result):
+    """Insert the pending books in one transaction and move them to the result.
+
+    Their Elo is seeded from the library's bounds. Return the books inserted.
+    """
+    bounds = library.elo_bounds()
+    for book in pending:
+        book.elo = rating_to_elo(book.rating, bounds)
+
+    insert_many(pending, library.user_id)
+    result.new_books.extend(pending)
+    books = list(pending)
+    pending.clear()
+    return books
+
+
+def _add_chunk(library, pending, result):
+    """Insert the pending books and add them to the library. Runs on its actor.
+
+    Duplicates and BOOK_LIMIT are checked again first, against the library as it is
+    now: other changes (e.g., a book added by hand) may have come in since the rows
+    were read.
+    """
+    kept = []
+    for book in pending:
+        if library.find(book.title, book.author):
+            result.skipped += 1
+        elif len(library) + len(kept) >= BOOK_LIMIT:
+            result.interrupted = True
+            break
+        else:
+            kept.append(book)
+
+    pending[:] = kept
+    library.extend(_insert_chunk(library, pending, result))
+    library.sync.pull(library)
+
+
+def _process_row(row, i, library, new_keys, pending, result):
+    """Validate a single CSV row, queueing new books and updating the import result."""
     title = (row.get("title") or "").strip()
     author = (row.get("author") or "").strip()
     raw_rating = (row.get("rating") or "").strip()
@@ -59,10 +194,9 @@ def _process_row(row, i, existing_books, result):
         )
         return
 
-    if (title.lower(), author.lower()) in existing_books:
+    key = book_key(title, author)
+    if key in new_keys or library.find(title, author):
         result.skipped += 1
     else:
-        book = Book(title, author, rating)
-        insert(book)
-        result.new_books.append(book)
-        existing_books.add((title.lower(), author.lower()))
+        pending.append(Book(title, author, rating))
+        new_keys.add(key)
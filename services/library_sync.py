@@ -0,0 +1,101 @@
+import time
+from collections import Counter
+
+from config import LIBRARY_SYNC_INTERVAL
+from db import changes_repo, executor
+from models import Book
+
+
+class LibrarySync:
+    """Apply what other processes (e.g., other API workers) wrote to a library.
+
+    At most every interval seconds, refresh() compares the library's watermark to the
+    database's, a single indexed query. If it moved, the new books and comparisons are
+    read and applied on the library's actor: books are added, matches are added to
+    the history, and the Elo of every book in them is set to the stored one. Matches
+    this process recorded itself are skipped, by counting them in with expect().
+
+    After writing a change itself, the API pulls right away, so the library (and its
+    ETag) is back in step with the database.
+
+    Other processes only see matches once they're written, so with write-behind
+    enabled, workers can be up to WRITE_BEHIND_INTERVAL seconds apart (each keeps
+    its own journal, so none replays another's matches). If two
+    workers update the same book at once, the last Elo written wins.
+    """
+
+    def __init__(self, library, interval=LIBRARY_SYNC_INTERVAL):
+        self.library = library
+        self.interval = interval
+        self._expected = Counter()  # {(winner_id, loser_id): own matches not yet read}
+        self._checked_at = None
+
+    def expect(self, winner, loser):
+        """Note a match this process is recording, so it isn't applied twice."""
+        self._expected[winner.id, loser.id] += 1
+
+    async def refresh(self):
+        """Apply changes written by other processes, if it's time to check."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.interval:
+            return
+        self._checked_at = now
+
+        latest = await executor.read(changes_repo.watermark, self.library.user_id)
+        if latest != self.library.watermark:
+            await self.library.actor.call(self.pull)
+
+    def pull(self, library):
+        """Read and apply everything past the library's watermark. Runs on the actor.
+
+        Once no matches of its own are left to read, the library holds exactly what
+        the database does up to the new watermark.
+        """
+        rows, comparisons, elos, watermark = changes_repo.changes_since(
+            library.user_id, library.watermark
+        )
+
+        for row in rows:
+            if library.get(row["id"]) is None:
+                library.add(
+                    Book(
+                        title=row["title"],
+                        author=row["author"],
+                        rating=row["rating"],
+                        elo=row["elo"],
+                        book_id=row["id"],
+                    )
+                )
+
+        changed = {}
+        for winner_id, loser_id in comparisons:
+            if self._expected[winner_id, loser_id]:
+                self._expected[winner_id, loser_id] -= 1
+                continue
+
+            winner, loser = library.get(winner_id), library.get(loser_id)
+            if winner is None or loser is None:
+                continue
+            winner.record_opponent(loser.id)
+            loser.record_opponent(winner.id)
+            winner.record_won_over(loser.id)
+            changed[winner.id], changed[loser.id] = winner, loser
+
+        self._expected = +self._expected  # drop pairs no longer expected
+        library.watermark = watermark
+        if rows or changed:
+            _apply_elos(library, list(changed.values()), elos)
+        if not self._expected:
+            library.synced_version = library.version
+
+
+def _apply_elos(library, books, elos):
+    """Set books to their stored Elo, then refresh what depends on them."""
+    old_elos = [book.elo for book in books]
+    for book in books:
+        book.update_elo(elos[book.id])
+
+    library.scoring.refresh(books, old_elos)
+    library.ranking.update(books, old_elos)
+    library.matches.discard(books)
+    library.changed()
@@ -0,0 +1,88 @@
+import threading
+from collections import deque
+
+from config import MATCH_QUEUE_MAX_LAG, MATCH_QUEUE_REFILL_AT, MATCH_QUEUE_SIZE
+from services.game_service import select_opponents
+
+
+class MatchQueue:
+    """Opponent pairs drawn ahead of time for a library, so serving one is a pop.
+
+    A background thread tops the queue back up to size pairs whenever fewer than
+    refill_at are left. Pairs are drawn from the weights at the time, so a pair is
+    dropped once the library has changed more than max_lag times since it was drawn
+    (e.g., max_lag matches later), or as soon as a match involves either of its books.
+
+    Drawing reads the library's scoring engine, so it holds library.lock, which
+    anything changing the library's books must hold too (then call discard() while
+    still holding it).
+    """
+
+    def __init__(
+        self,
+        library,
+        size=MATCH_QUEUE_SIZE,
+        refill_at=MATCH_QUEUE_REFILL_AT,
+        max_lag=MATCH_QUEUE_MAX_LAG,
+    ):
+        self.library = library
+        self.size = size
+        self.refill_at = refill_at
+        self.max_lag = max_lag
+        self._pairs = deque()  # [(book_a, book_b, library version when drawn)]
+        self._lock = threading.Lock()
+        self._refilling = False
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def pop(self, draw=True):
+        """Return the next fresh (book_a, book_b) pair, drawing one now if none is.
+
+        If draw is false, return None instead of drawing, e.g., to draw the pair on
+        another thread.
+        """
+        pair = None
+        with self._lock:
+            while self._pairs and pair is None:
+                book_a, book_b, version = self._pairs.popleft()
+                if self.library.version - version <= self.max_lag:
+                    pair = book_a, book_b
+
+        self._schedule_refill()
+        if pair is None and draw:
+            with self.library.lock:
+                pair = select_opponents(self.library.scoring)
+        return pair
+
+    def discard(self, books):
+        """Drop queued pairs involving any of the given books, e.g., after a match."""
+        ids = {book.id for book in books}
+        with self._lock:
+            self._pairs = deque(
+                pair
+                for pair in self._pairs
+                if pair[0].id not in ids and pair[1].id not in ids
+            )
+        self._schedule_refill()
+
+    def _schedule_refill(self):
+        with self._lock:
+            if self._refilling or len(self._pairs) >= self.refill_at:
+                return
+            self._refilling = True
+
+        threading.Thread(target=self._refill, name="match-queue", daemon=True).start()
+
+    def _refill(self):
+        try:
+            while len(self._pairs) < self.size and len(self.library) >= 2:
+                # Queue the pair before a match can change the library, so discard()
+                # sees it if the match involves either book.
+                with self.library.lock:
+                    book_a, book_b = select_opponents(self.library.scoring)
+                    with self._lock:
+                        self._pairs.append((book_a, book_b, self.library.version))
+        finally:
+            with self._lock:
+                self._refilling = False
@@ -1,3 +1,9 @@
+import math
+from bisect import bisect_left, bisect_right
+
+from config import DEFAULT_RATING
+
+
 def rank_books(books):
     """Rank all books based on their Elo score.
 
@@ -8,57 +14,198 @@ def rank_books(books):
 
     ranked = []
     i = 0
-    rank = 0
     while i < len(elo_sort):
         tied_group = [elo_sort[i]]
         while i + 1 < len(elo_sort) and elo_sort[i + 1].elo == elo_sort[i].elo:
             i += 1
             tied_group.append(elo_sort[i])
 
-        rank += 1
-
-        if len(tied_group) == 1:
-            ranked.append((str(rank), tied_group[0]))
-        else:
-            ranked.extend(_tiebreak(tied_group, rank))
-
-        rank += len(tied_group) - 1
+        rank = i + 2 - len(tied_group)
+        ranked.extend(_display_ranks(rank, _tiebreak(tied_group)))
         i += 1
 
     return ranked
 
 
-def _tiebreak(tied_group, rank):
-    """Sort a tied group by head-to-head wins, then initial user rating"""
-    tiebreak_scores = {b.id: _head_to_head_score(b, tied_group) for b in tied_group}
-    tied_group.sort(key=lambda b: (tiebreak_scores[b.id], b.rating), reverse=True)
+class RankingIndex:
+    """Books kept in rank order between matches, equivalent to rank_books().
 
-    ranked = []
-    current_rank = rank
+    Books are stored as a sorted list of (-elo, position) keys searched with bisect,
+    so a changed Elo is moved in O(log n) searches plus one list shift, and the book
+    at any rank is found by index. Tiebreaks are cached per tied Elo and only
+    recomputed for the Elo values a changed book left or landed on. The ranked list
+    itself is cached until the next change, and `version` is bumped on every change
+    so consumers can tell when the ranking moved.
+
+    New books appended to `books` are picked up on the next read.
+    """
+
+    def __init__(self, books):
+        self.books = books
+        self.version = 0
+        self._keys = []  # [(-elo, position in books)], sorted
+        self._order = []  # [Book], aligned with _keys
+        self._positions = {}  # {book_id: position in books}
+        self._tiebreaks = {}  # {elo: [(offset, tied, book)]}, see _tiebreak()
+        self._ranked = None
+        self._sync()
+
+    def update(self, changed_books, old_elos):
+        """Reposition books after a match changed their Elo (or head-to-head wins)."""
+        self._sync()
+        for book, old_elo in zip(changed_books, old_elos):
+            position = self._positions[book.id]
+            old_key = (-old_elo, position)
+            i = bisect_left(self._keys, old_key)
+            # Books indexed after the change (e.g., just added) are already in place
+            if book.elo != old_elo and i < len(self._keys) and self._keys[i] == old_key:
+                del self._keys[i]
+                del self._order[i]
+                self._insert(book, position)
+
+            self._tiebreaks.pop(old_elo, None)
+            self._tiebreaks.pop(book.elo, None)
+
+        self._changed()
+
+    def __len__(self):
+        self._sync()
+        return len(self._order)
+
+    def ranked(self):
+        """Return every book as a (display_rank, book) pair, as rank_books() does."""
+        self._sync()
+        if self._ranked is None:
+            self._ranked = self.page(0, len(self._order))
+        return self._ranked
+
+    def page(self, start, stop):
+        """Return the (display_rank, book) pairs ranked from start up to stop.
+
+        Only the tied groups overlapping the page are tiebroken, so a page costs
+        O(page + log n) once the tiebreaks of those groups are cached.
+        """
+        self._sync()
+        stop = min(stop, len(self._order))
+        if self._ranked is not None:
+            return self._ranked[start:stop]
+
+        ranked = []
+        i = start
+        while i < stop:
+            group_start = self._group_start(i)
+            group_end = self._group_end(group_start)
+            tiebreak = self._tiebreak(group_start, group_end)
+            page = tiebreak[i - group_start : stop - group_start]
+            ranked.extend(_display_ranks(group_start + 1, page))
+            i = group_end
+
+        return ranked
+
+    def position(self, book):
+        """Return the book's 0-based position in the ranking."""
+        self._sync()
+        i = bisect_left(self._keys, (-book.elo, self._positions[book.id]))
+        group_start = self._group_start(i)
+        group_end = self._group_end(group_start)
+        tiebreak = self._tiebreak(group_start, group_end)
+        return group_start + next(
+            j for j, (_, _, tied_book) in enumerate(tiebreak) if tied_book is book
+        )
+
+    def _sync(self):
+        """Add books appended to the library since the last call."""
+        if len(self._positions) == len(self.books):
+            return
+
+        for position in range(len(self._positions), len(self.books)):
+            book = self.books[position]
+            self._positions[book.id] = position
+            self._insert(book, position)
+            self._tiebreaks.pop(book.elo, None)
+
+        self._changed()
+
+    def _insert(self, book, position):
+        key = (-book.elo, position)
+        i = bisect_left(self._keys, key)
+        self._keys.insert(i, key)
+        self._order.insert(i, book)
+
+    def _changed(self):
+        self._ranked = None
+        self.version += 1
+
+    def _group_start(self, i):
+        """Return where the tied group holding position i starts."""
+        return bisect_left(self._keys, (-self._order[i].elo, -math.inf))
+
+    def _group_end(self, start):
+        """Return where the tied group starting at position start ends."""
+        return bisect_right(self._keys, (-self._order[start].elo, math.inf))
+
+    def _tiebreak(self, start, end):
+        elo = self._order[start].elo
+        tiebreak = self._tiebreaks.get(elo)
+        if tiebreak is None:
+            tiebreak = self._tiebreaks[elo] = _tiebreak(self._order[start:end])
+        return tiebreak
+
+
+def _display_ranks(rank, tiebreak):
+    """Turn a group's tiebreak into (display_rank, book) pairs, from the given rank."""
+    return [
+        (f"{rank + offset}~" if tied else str(rank + offset), book)
+        for offset, tied, book in tiebreak
+    ]
+
+
+def _tiebreak(tied_group):
+    """Sort a tied group by head-to-head wins, then initial user rating.
+
+    Return (offset, tied, book) triples in rank order, where offset is the book's rank
+    relative to the group's first rank and tied flags books that still share a rank.
+    """
+    if len(tied_group) == 1:
+        return [(0, False, tied_group[0])]
+
+    tied_ids = {b.id for b in tied_group}
+    tiebreak_scores = {b.id: _head_to_head_score(b, tied_ids) for b in tied_group}
+    tied_group = sorted(
+        tied_group, key=lambda b: (tiebreak_scores[b.id], _rating(b)), reverse=True
+    )
+
+    tiebreak = []
+    offset = 0
     for j, book in enumerate(tied_group):
         tied_to_prev = (
             j > 0
             and tiebreak_scores[tied_group[j - 1].id] == tiebreak_scores[book.id]
-            and book.rating == tied_group[j - 1].rating
+            and _rating(book) == _rating(tied_group[j - 1])
         )
         tied_to_next = (
             j < len(tied_group) - 1
             and tiebreak_scores[tied_group[j + 1].id] == tiebreak_scores[book.id]
-            and book.rating == tied_group[j + 1].rating
+            and _rating(book) == _rating(tied_group[j + 1])
         )
 
-        display_rank = (
-            f"{current_rank}~" if tied_to_next or tied_to_prev else str(current_rank)
-        )
-        ranked.append((display_rank, book))
+        tiebreak.append((offset, tied_to_next or tied_to_prev, book))
 
         if not tied_to_next:
-            current_rank += 1
+            offset += 1
 
-    return ranked
+    return tiebreak
+
+
+def _rating(book):
+    """Return the book's initial rating, counting unrated books as DEFAULT_RATING."""
+    return book.rating if book.rating is not None else DEFAULT_RATING
 
 
-def _head_to_head_score(book, tied_books):
-    tied_opponents = {b.id for b in tied_books if b.id != book.id}
-    wins = sum(book.won_over.get(opp_id, 0) for opp_id in tied_opponents)
-    return wins
+def _head_to_head_score(book, tied_ids):
+    """Return the book's wins against the other books in its tied group.
+
+    Walks the book's wins rather than the group, since large groups (e.g., every
+    unplayed book at the starting Elo) have few wins between them.
+    """
+    return sum(wins for opp_id, wins in book.won_over.items() if opp_id in tied_ids)
@@ -1,6 +1,9 @@
 import math
 
-from models import Book
+import numpy as np
+
+from models import ELO_MAX, ELO_MIN, EloIndex
+from services.weighted_sampler import WeightedSampler
 
 ABS_SCORE_WEIGHT = 0.30
 LOC_SCORE_WEIGHT = 0.45
@@ -11,6 +14,10 @@ ABS_MIN_PERCENTAGE = 0.10
 LOCAL_WINDOW = 0.10
 DENSITY_WINDOW = 24
 
+# LOCAL_WINDOW as an Elo difference, i.e., the gap at which the expected score is
+# 0.5 ± LOCAL_WINDOW. Used to narrow index lookups before the exact window check.
+LOCAL_ELO_WINDOW = 400 * math.log10((0.5 + LOCAL_WINDOW) / (0.5 - LOCAL_WINDOW))
+
 K_TIERS = [(0.25, 40), (0.5, 32), (0.75, 24), (1.0, 16)]
 
 
@@ -27,8 +34,7 @@ def calculate_progress(books):
     """Return the average confidence score of all books."""
     if not books:
         return 0
-    confidence_scores = [confidence_score(book, books) for book in books]
-    return sum(confidence_scores) / len(confidence_scores)
+    return float(score_all(books)["confidence"].mean())
 
 
 def confidence_score(book, books):
@@ -76,33 +82,64 @@ def _local_score(book, books):
 
     Measures how many opponents a book has faced that are similar to the book's Elo.
     """
+    relevant_opponents, relevant_opp_faced = _local_counts(book, books)
+    return _local_ratio(relevant_opponents, relevant_opp_faced)
+
+
+def _local_counts(book, books):
+    """Count the opponents in a book's local window, and how many it has faced."""
+    index = _elo_index(book, books)
+    candidates = index.within(book.elo, LOCAL_ELO_WINDOW + 1) if index else books
+
+    faced = set(book.opponents)
     relevant_opponents = relevant_opp_faced = 0
-    for opp in books:
-        if (
-            opp.id != book.id
-            and abs(_expected_score(book.elo, opp.elo) - 0.5) <= LOCAL_WINDOW
-        ):
+    for opp in candidates:
+        if opp.id != book.id and _in_local_window(book.elo, opp.elo):
             relevant_opponents += 1
-            if opp.id in book.opponents:
+            if opp.id in faced:
                 relevant_opp_faced += 1
 
+    return relevant_opponents, relevant_opp_faced
+
+
+def _local_ratio(relevant_opponents, relevant_opp_faced):
     return relevant_opp_faced / relevant_opponents if relevant_opponents else 1
 
 
+def _in_local_window(elo, opp_elo):
+    return abs(_expected_score(elo, opp_elo) - 0.5) <= LOCAL_WINDOW
+
+
 def _stability_score(book, books):
     """Calculates a book's stability score.
 
     Measures how many books have a close Elo to the book. High score density implies a
     higher chance for ranks to shift (i.e., lower stability in rankings).
     """
-    tight_neighbors = sum(
+    return _density_stability(book, _tight_neighbors(book, books), elo_bounds(books))
+
+
+def _tight_neighbors(book, books):
+    """Count the other books within DENSITY_WINDOW of a book's Elo."""
+    index = _elo_index(book, books)
+    if index:
+        return index.count_within(book.elo, DENSITY_WINDOW) - 1
+
+    return sum(
         1
         for opp in books
         if opp.id != book.id and abs(book.elo - opp.elo) <= DENSITY_WINDOW
     )
 
-    upper_proximity = max(0, 1 - (Book.elo_max - book.elo) / DENSITY_WINDOW)
-    lower_proximity = max(0, 1 - (book.elo - Book.elo_min) / DENSITY_WINDOW)
+
+def _density_stability(book, tight_neighbors, bounds):
+    """Turn a neighbor count into a stability score, boosting density near the edges.
+
+    The edges are the library's (min, max) Elo bounds.
+    """
+    elo_min, elo_max = bounds
+    upper_proximity = max(0, 1 - (elo_max - book.elo) / DENSITY_WINDOW)
+    lower_proximity = max(0, 1 - (book.elo - elo_min) / DENSITY_WINDOW)
     edge_factor = 1 + max(upper_proximity, lower_proximity)
 
     density = min((tight_neighbors * edge_factor) / 10, 1)
@@ -110,6 +147,28 @@ def _stability_score(book, books):
     return 1 - density
 
 
+def elo_bounds(books):
+    """Return the library's (min, max) Elo bounds, as EloIndex.bounds() does.
+
+    Read off the books' EloIndex if it covers the library, otherwise scanned.
+    """
+    index = _elo_index(books[0], books) if books else None
+    if index:
+        return index.bounds()
+
+    elos = [b.elo for b in books]
+    return min([ELO_MIN, *elos]), max([ELO_MAX, *elos])
+
+
+def _elo_index(book, books):
+    """Return the book's EloIndex if it covers the given library, otherwise None.
+
+    Books appended to the library without being indexed fall back to linear scans.
+    """
+    index = book.elo_index
+    return index if index is not None and len(index) == len(books) else None
+
+
 def score_breakdown(book, books):
     """Return a dictionary of detailed calculations pertaining to a given book.
 
@@ -140,15 +199,124 @@ def score_breakdown(book, books):
     }
 
 
+# ====== BATCH SCORING
+
+SCORE_DTYPE = np.dtype(
+    [
+        ("id", np.int64),
+        ("absolute", np.float64),
+        ("local", np.float64),
+        ("stability", np.float64),
+        ("confidence", np.float64),
+        ("k", np.int64),
+        ("sampling_weight", np.float64),
+    ]
+)
+
+
+def score_all(books):
+    """Score every book in a handful of vectorized passes.
+
+    Return a structured array aligned with `books` holding each book's absolute,
+    local, stability, and confidence scores, K value, and sampling weight, matching
+    the scalar functions above within float tolerance. Neighbor counts come from a
+    sorted Elo array and faced opponents from an array of (book, opponent) pairs.
+    """
+    n = len(books)
+    scores = np.zeros(n, dtype=SCORE_DTYPE)
+    if n == 0:
+        return scores
+
+    positions = {book.id: i for i, book in enumerate(books)}
+    elos = np.array([book.elo for book in books], dtype=np.float64)
+    opponent_counts = np.array([len(book.opponents) for book in books])
+    pairs = np.array(
+        [
+            (i, positions[opp_id])
+            for i, book in enumerate(books)
+            for opp_id in book.opponents
+            if opp_id in positions
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    sorted_elos = np.sort(elos)
+
+    # Absolute score
+    absolute_cap = (
+        max(n * ABS_MIN_PERCENTAGE, ABS_MIN_OPPONENTS) if n > ABS_MIN_OPPONENTS else 1
+    )
+    abs_scores = np.minimum(opponent_counts / absolute_cap, 1)
+
+    # Local score: relevant opponents counted within the equivalent Elo band, and
+    # faced opponents checked against the exact expected score window.
+    relevant = _count_within(sorted_elos, elos, LOCAL_ELO_WINDOW) - 1
+    book_elos, opp_elos = elos[pairs[:, 0]], elos[pairs[:, 1]]
+    expected = 1 / (1 + 10 ** ((opp_elos - book_elos) / 400))
+    in_window = np.abs(expected - 0.5) <= LOCAL_WINDOW
+    faced = np.bincount(pairs[in_window, 0], minlength=n)
+    loc_scores = np.divide(faced, relevant, out=np.ones(n), where=relevant > 0)
+
+    # Stability score
+    tight_neighbors = _count_within(sorted_elos, elos, DENSITY_WINDOW) - 1
+    elo_min, elo_max = min(ELO_MIN, elos.min()), max(ELO_MAX, elos.max())
+    upper_proximity = np.maximum(0, 1 - (elo_max - elos) / DENSITY_WINDOW)
+    lower_proximity = np.maximum(0, 1 - (elos - elo_min) / DENSITY_WINDOW)
+    edge_factor = 1 + np.maximum(upper_proximity, lower_proximity)
+    sta_scores = 1 - np.minimum((tight_neighbors * edge_factor) / 10, 1)
+
+    con_scores = (
+        abs_scores * ABS_SCORE_WEIGHT
+        + loc_scores * LOC_SCORE_WEIGHT
+        + sta_scores * DEN_SCORE_WEIGHT
+    )
+    early_boost = (n * ABS_MIN_PERCENTAGE) * (1 - abs_scores)
+
+    scores["id"] = [book.id if book.id is not None else -1 for book in books]
+    scores["absolute"] = abs_scores
+    scores["local"] = loc_scores
+    scores["stability"] = sta_scores
+    scores["confidence"] = con_scores
+    scores["k"] = _k_values(con_scores)
+    scores["sampling_weight"] = np.maximum(np.maximum(0.1, 1 - con_scores), early_boost)
+
+    # A lone book is fully confident, as in confidence_score() and friends.
+    if n == 1:
+        scores["confidence"] = 1
+        scores["k"] = K_TIERS[0][1]
+        scores["sampling_weight"] = 1
+
+    return scores
+
+
+def _count_within(sorted_elos, elos, distance):
+    """Count the books within distance of each Elo (including the book itself)."""
+    upper = np.searchsorted(sorted_elos, elos + distance, side="right")
+    lower = np.searchsorted(sorted_elos, elos - distance, side="left")
+    return upper - lower
+
+
+def _k_values(con_scores):
+    """Vectorized K tier lookup: the first tier whose threshold is >= confidence."""
+    thresholds = np.array([threshold for threshold, _ in K_TIERS])
+    k_values = np.array([k for _, k in K_TIERS])
+    tiers = np.searchsorted(thresholds, con_scores, side="left")
+    return k_values[np.minimum(tiers, len(K_TIERS) - 1)]
+
+
 # ====== ELO CALCULATION
 
 
 def calculate_elo(winner, loser, books):
     """Calculates each book's new Elo scores after a match."""
+    return _apply_elo(winner, loser, _get_k(winner, books), _get_k(loser, books))
+
+
+def _apply_elo(winner, loser, k_winner, k_loser):
+    """Apply the Elo formula to a match, given each book's K value."""
     expected_w = _expected_score(winner.elo, loser.elo)
     expected_l = _expected_score(loser.elo, winner.elo)
-    new_winner_elo = round(winner.elo + _get_k(winner, books) * (1 - expected_w))
-    new_loser_elo = round(loser.elo + _get_k(loser, books) * (0 - expected_l))
+    new_winner_elo = round(winner.elo + k_winner * (1 - expected_w))
+    new_loser_elo = round(loser.elo + k_loser * (0 - expected_l))
 
     return new_winner_elo, new_loser_elo
 
@@ -200,16 +368,241 @@ def opponent_weights(book_a, books):
     candidates = []
     for b in books:
         if b.id != book_a.id:
-            # Increase the multiplier to penalize rematches more
-            rematch_penalty = 1 + 2 * book_a.opponents.get(b.id, 0)
-
-            # Decrease the divisor to prioritize similar score ranges
-            elo_gap_penalty = 1 + abs(book_a.elo - b.elo) / 150
-
             # Calculate the base weight based on confidence level
             w = max(0.1, 1 - confidence_score(b, books))
-            adjusted_weight = max(0.1, w / rematch_penalty / elo_gap_penalty)
-
-            candidates.append((b, adjusted_weight))
+            candidates.append((b, _adjusted_weight(book_a, b, w)))
 
     return candidates
+
+
+def _adjusted_weight(book_a, b, w):
+    """Scale book b's base weight down for rematches and large Elo gaps to book_a.
+
+    The result never exceeds the base weight w, since w itself is at least 0.1.
+    """
+    # Increase the multiplier to penalize rematches more
+    rematch_penalty = 1 + 2 * book_a.opponents.get(b.id, 0)
+
+    # Decrease the divisor to prioritize similar score ranges
+    elo_gap_penalty = 1 + abs(book_a.elo - b.elo) / 150
+
+    return max(0.1, w / rematch_penalty / elo_gap_penalty)
+
+
+# ====== SCORING ENGINE
+
+
+class ScoringEngine:
+    """Keep every book's confidence components cached between matches.
+
+    The scalar functions above rescan the whole library on every call, which makes
+    whole-library passes (progress, matchmaking weights) quadratic. The engine stores
+    each book's local and density window counts and, after a match, adjusts only the
+    books whose windows the moved Elo scores entered or left. All values match the
+    scalar functions exactly.
+
+    It also keeps two WeightedSamplers in sync with the scores: one over sampling
+    weights, to draw book_a, and one over base opponent weights, to propose book_b.
+    """
+
+    def __init__(self, books):
+        self.books = books
+        self.index = None
+        self.selection = None  # WeightedSampler over sampling weights
+        self.opponent_pool = None  # WeightedSampler over base opponent weights
+        self._positions = {}  # {book_id: position in books}
+        self._counts = {}  # {book_id: [relevant, relevant_faced, tight_neighbors]}
+        self._scores = {}  # {book_id: (absolute, local, stability, confidence)}
+        self._size = 0
+        self._bounds = (ELO_MIN, ELO_MAX)
+        self._progress = None
+        self.rebuild()
+
+    def rebuild(self):
+        """Re-index and recompute the scores of every book in the library."""
+        self.index = EloIndex(self.books)
+        self._positions = {book.id: i for i, book in enumerate(self.books)}
+        self._counts = {book.id: self._count(book) for book in self.books}
+        self._size = len(self.books)
+        self._bounds = self.index.bounds()
+        self._progress = None
+        self._scores = {book.id: self._score(book) for book in self.books}
+
+        self.selection = WeightedSampler(self.sampling_weight(b) for b in self.books)
+        self.opponent_pool = WeightedSampler(self.base_weight(b) for b in self.books)
+
+    def sync(self):
+        """Rebuild if books were added or imported since the last pass.
+
+        Books added to the library change every book's scores, and aren't in the
+        samplers yet. Return whether it rebuilt.
+        """
+        if len(self.books) == self._size:
+            return False
+        self.rebuild()
+        return True
+
+    def refresh(self, changed_books, old_elos):
+        """Update the scores affected by a change in the given books' Elo scores.
+
+        Changed books are recounted from scratch. Every other book whose local or
+        density window contained the old or new Elo of a changed book has its counts
+        adjusted by one. When the library's Elo bounds moved, books close enough to
+        either edge are rescored as well.
+        """
+        if self.sync():
+            return
+
+        search_window = max(LOCAL_ELO_WINDOW, DENSITY_WINDOW) + 1
+        changed_ids = {book.id for book in changed_books}
+        touched = {}
+
+        for mover, old_elo in zip(changed_books, old_elos):
+            if mover.elo == old_elo:
+                continue
+            neighbors = {
+                book.id: book
+                for elo in (old_elo, mover.elo)
+                for book in self.index.within(elo, search_window)
+                if book.id not in changed_ids
+            }
+            # Matches are symmetric, so whether a neighbor faced the mover can be
+            # checked against a single set of the mover's opponents.
+            mover_opponents = set(mover.opponents)
+            for book in neighbors.values():
+                if self._shift_counts(book, mover, old_elo, mover_opponents):
+                    touched[book.id] = book
+
+        for book in changed_books:
+            self._counts[book.id] = self._count(book)
+            touched[book.id] = book
+
+        bounds = self.index.bounds()
+        if bounds != self._bounds:
+            for edge in set(self._bounds + bounds):
+                for book in self.index.within(edge, DENSITY_WINDOW):
+                    touched[book.id] = book
+            self._bounds = bounds
+
+        for book in touched.values():
+            self._scores[book.id] = self._score(book)
+            position = self._positions[book.id]
+            self.selection.update(position, self.sampling_weight(book))
+            self.opponent_pool.update(position, self.base_weight(book))
+
+        self._progress = None
+
+    def confidence(self, book):
+        """Cached equivalent of confidence_score()."""
+        if len(self.books) < 1:
+            return 0
+        if len(self.books) == 1:
+            return 1
+        return self._components(book)[3]
+
+    def breakdown(self, book):
+        """Cached equivalent of score_breakdown()."""
+        abs_score, loc_score, sta_score, con_score = self._components(book)
+
+        k_value = next(k for threshold, k in K_TIERS if con_score <= threshold)
+
+        early_boost = (len(self.books) * ABS_MIN_PERCENTAGE) * (1 - abs_score)
+        selection_weight = max(0.1, 1 - con_score, early_boost)
+
+        return {
+            "k": k_value,
+            "confidence": con_score,
+            "absolute": abs_score,
+            "local": loc_score,
+            "stability": sta_score,
+            "sampling_weight": selection_weight,
+        }
+
+    def progress(self):
+        """Cached equivalent of calculate_progress()."""
+        if len(self.books) <= 1:
+            return len(self.books)
+        self.sync()
+        if self._progress is None:
+            confidence_scores = [scores[3] for scores in self._scores.values()]
+            self._progress = sum(confidence_scores) / len(confidence_scores)
+        return self._progress
+
+    def k(self, book):
+        """Cached equivalent of _get_k()."""
+        if len(self.books) <= 1:
+            return K_TIERS[0][1]
+        confidence = self.confidence(book)
+        return next(k for threshold, k in K_TIERS if confidence <= threshold)
+
+    def calculate_elo(self, winner, loser):
+        """Cached equivalent of calculate_elo()."""
+        return _apply_elo(winner, loser, self.k(winner), self.k(loser))
+
+    def sampling_weight(self, book):
+        """Cached equivalent of sampling_weight()."""
+        if len(self.books) <= 1:
+            return 1
+
+        abs_score = self._components(book)[0]
+        early_boost = (len(self.books) * ABS_MIN_PERCENTAGE) * (1 - abs_score)
+        confidence_weight = 1 - self.confidence(book)
+
+        return max(0.1, confidence_weight, early_boost)
+
+    def base_weight(self, book):
+        """Return a book's opponent weight before rematch and Elo gap penalties."""
+        return max(0.1, 1 - self.confidence(book))
+
+    def opponent_weight(self, book_a, b):
+        """Return book b's opponent weight against book_a, as in opponent_weights()."""
+        return _adjusted_weight(book_a, b, self.base_weight(b))
+
+    def opponent_weights(self, book_a):
+        """Cached equivalent of opponent_weights()."""
+        return [
+            (b, self.opponent_weight(book_a, b))
+            for b in self.books
+            if b.id != book_a.id
+        ]
+
+    def _components(self, book):
+        self.sync()
+        return self._scores[book.id]
+
+    def _count(self, book):
+        relevant, relevant_faced = _local_counts(book, self.books)
+        return [relevant, relevant_faced, _tight_neighbors(book, self.books)]
+
+    def _shift_counts(self, book, mover, old_elo, mover_opponents):
+        """Adjust a book's window counts after mover's Elo changed from old_elo.
+
+        Return whether any count changed.
+        """
+        counts = self._counts[book.id]
+
+        local_shift = _in_local_window(book.elo, mover.elo) - _in_local_window(
+            book.elo, old_elo
+        )
+        density_shift = (abs(book.elo - mover.elo) <= DENSITY_WINDOW) - (
+            abs(book.elo - old_elo) <= DENSITY_WINDOW
+        )
+
+        counts[0] += local_shift
+        if book.id in mover_opponents:
+            counts[1] += local_shift
+        counts[2] += density_shift
+
+        return bool(local_shift or density_shift)
+
+    def _score(self, book):
+        relevant, relevant_faced, tight_neighbors = self._counts[book.id]
+        abs_score = _absolute_score(book, self.books)
+        loc_score = _local_ratio(relevant, relevant_faced)
+        sta_score = _density_stability(book, tight_neighbors, self._bounds)
+        con_score = (
+            abs_score * ABS_SCORE_WEIGHT
+            + loc_score * LOC_SCORE_WEIGHT
+            + sta_score * DEN_SCORE_WEIGHT
+        )
+        return abs_score, loc_score, sta_score, con_score
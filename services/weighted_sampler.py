@@ -0,0 +1,78 @@
+import random
+
+
+class WeightedSampler:
+    """Weighted random selection over a fixed set of items, backed by a Fenwick tree.
+
+    Draws and point updates both run in O(log n), so a library's sampling weights can
+    be kept up to date after every match instead of being rebuilt for every draw.
+    """
+
+    def __init__(self, weights):
+        self._weights = [float(w) for w in weights]
+        self._tree = []
+        self._updates = 0
+        self._rebuild()
+
+    def __len__(self):
+        return len(self._weights)
+
+    def weight(self, i):
+        return self._weights[i]
+
+    def total(self):
+        """Return the sum of all weights."""
+        total = 0.0
+        i = len(self._weights)
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def update(self, i, weight):
+        """Set the weight of item i."""
+        weight = float(weight)
+        delta = weight - self._weights[i]
+        if not delta:
+            return
+        self._weights[i] = weight
+
+        # Repeated deltas accumulate rounding error, so rebuild from the exact
+        # weights every n updates.
+        self._updates += 1
+        if self._updates >= len(self._weights):
+            self._rebuild()
+            return
+
+        i += 1
+        while i <= len(self._weights):
+            self._tree[i] += delta
+            i += i & -i
+
+    def sample(self):
+        """Return the index of an item drawn with probability proportional to weight."""
+        n = len(self._weights)
+        remaining = random.random() * self.total()
+
+        position = 0
+        step = 1 << (n.bit_length() - 1) if n else 0
+        while step:
+            candidate = position + step
+            if candidate <= n and self._tree[candidate] <= remaining:
+                position = candidate
+                remaining -= self._tree[candidate]
+            step >>= 1
+
+        # Guard against rounding pushing the draw past the last item
+        return min(position, n - 1)
+
+    def _rebuild(self):
+        """Build the tree from the weights in O(n)."""
+        n = len(self._weights)
+        tree = [0.0] + self._weights
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._updates = 0
@@ -1,4 +1,6 @@
 db_path = "data/book_brawl.db"  # default db
 
-books = []
+library = None  # Library of the terminal app
+libraries = None  # LibraryCache of per-user libraries, used by the API
+import_jobs = None  # ImportJobs running the API's CSV imports
 progress = 0